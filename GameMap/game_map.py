@@ -3,11 +3,37 @@ from typing import Sequence
 
 import numpy as np
 import numpy.typing as npt
-import PIL.Image
 import pygame
 
+from assets import asset_cache
 from helpers import make_2d_surface_from_array
 
+DECO_COLOR_KEY = (255, 0, 255)
+
+
+def pad_map_array(
+    array: npt.NDArray[np.uint8],
+    margin: npt.NDArray[np.int_],
+    fill_color: tuple[int, ...],
+) -> npt.NDArray[np.uint8]:
+    """Pad an image array on every side with a solid color
+
+    Args:
+        array: Image array of shape (y, x, channels)
+        margin: (x, y) amount of pixels to add on each side
+        fill_color: Color of the padding, one value per channel
+    """
+    margin_x, margin_y = margin
+    padded = np.empty(
+        (array.shape[0] + 2 * margin_y, array.shape[1] + 2 * margin_x, array.shape[2]),
+        array.dtype,
+    )
+    padded[...] = fill_color[: array.shape[2]]
+    padded[
+        margin_y : margin_y + array.shape[0], margin_x : margin_x + array.shape[1]
+    ] = array
+    return padded
+
 
 class MapSlicer:
     """Helper class for slicing into an image array"""
@@ -41,12 +67,23 @@ class MapSlicer:
         else:
             return (slice(start[0], end[0]), slice(start[1], end[1]))
 
+    def get_rect(self, scaling_factor: int = 1) -> pygame.Rect:
+        """Get the slicing window as a Rect in (scaled) pixel coordinates
+
+        Args:
+            scaling_factor: Scale applied to the image the Rect is used on
+        """
+        start = self._slice_start * self._slice_multi * scaling_factor
+        size = self._slice_size * self._slice_multi * scaling_factor
+        return pygame.Rect(int(start[0]), int(start[1]), int(size[0]), int(size[1]))
+
 
 class GameMap:
     """Class for handling the game's map
 
     Args:
-        floor_image_path: Path to the image to be used as the floor texture
+        floor_image_path: Path to the image to be used as the floor texture,
+            relative to the game directory or absolute
         deco_image_path: Path to the image to be used as the decoration
         pixels_per_tile: How many pixels per floor tile
         tiles_on_screen: How many tiles fit on screen
@@ -56,79 +93,66 @@ class GameMap:
 
     def __init__(
         self,
-        floor_image_path: pathlib.Path,
-        deco_image_path: pathlib.Path,
+        floor_image_path: pathlib.Path | str,
+        deco_image_path: pathlib.Path | str,
         pixels_per_tile: npt.NDArray[np.int_],
         tiles_on_screen: npt.NDArray[np.int_],
         scaling_factor: int,
         starting_position: npt.NDArray[np.int_],
     ):
-        self._floor_image_array = np.array(PIL.Image.open(floor_image_path))
-        self._deco_image_array = np.array(PIL.Image.open(deco_image_path))
+        # The layers are padded by half a screen so that every reachable viewport
+        # lies inside them and can be handed out as a subsurface of the layer
+        margin_tiles = tiles_on_screen // 2 + 1
+        margin_pixels = margin_tiles * pixels_per_tile
+        self._floor_image_array = pad_map_array(
+            asset_cache.array(floor_image_path), margin_pixels, (0, 0, 0)
+        )
+        self._deco_image_array = pad_map_array(
+            asset_cache.array(deco_image_path),
+            margin_pixels,
+            (*DECO_COLOR_KEY, 255),
+        )
         self._map_position = MapSlicer(
-            starting_position, tiles_on_screen, pixels_per_tile
+            starting_position + margin_tiles, tiles_on_screen, pixels_per_tile
         )
         self._scaling_factor = scaling_factor
+        # Both layers are scaled once here, update only picks a window of them
+        self._scaled_floor_surface = make_2d_surface_from_array(
+            self._floor_image_array,
+            scaling_factor=scaling_factor,
+        )
+        self._scaled_deco_surface = make_2d_surface_from_array(
+            self._deco_image_array,
+            scaling_factor=scaling_factor,
+            color_key=DECO_COLOR_KEY,
+        )
         self.floor_surface: pygame.Surface = pygame.Surface((0, 0))
         self.deco_surface: pygame.Surface = pygame.Surface((0, 0))
 
     def update(self, shift_amount: tuple[int, int] | Sequence[int]):
         """Update the map
 
+        The viewport surfaces are subsurfaces of the pre-scaled layers, so no
+        pixels are copied. Positions past the padding are clamped to its edge.
+
         Args:
             shift_amount: (x, y) amount to shift the map
         """
         self._map_position.shift(shift_amount)
-        map_slices = self._map_position.get_slices()
-        if all(map_slice.start >= 0 for map_slice in map_slices):
-            floor_array = self._floor_image_array[map_slices[0], map_slices[1]]
-            deco_array = self._deco_image_array[map_slices[0], map_slices[1]]
-        else:
-            array_size = np.array(
-                [map_slice.stop - map_slice.start for map_slice in map_slices]
-            )
-            tuple_slices = np.array(
-                [(map_slice.start, map_slice.stop) for map_slice in map_slices]
-            )
-            zero_overwrite_slices = np.zeros((2, 2), int)
-            alt_array_slices = np.zeros((2, 2), int)
-            for index, tup_slice in enumerate(tuple_slices):
-                if tup_slice[0] < 0:
-                    zero_overwrite_slices[index] = [
-                        -1 * tup_slice[0],
-                        array_size[index],
-                    ]
-                    alt_array_slices[index] = [0, tup_slice[1]]
-                else:
-                    zero_overwrite_slices[index] = [0, array_size[index]]
-                    alt_array_slices[index] = tup_slice
-            alt_slices = [slice(x, y) for x, y in alt_array_slices]
-            floor_array = np.zeros([*array_size, self._floor_image_array.shape[2]], int)
-            deco_array = np.zeros([*array_size, self._deco_image_array.shape[2]], int)
-            if map_slices[0].start < 0 <= map_slices[1].start:
-                zero_overwrite_slices[1, 1] = np.minimum(
-                    zero_overwrite_slices[1, 1],
-                    self._floor_image_array[alt_slices[0], alt_slices[1]].shape[1],
-                )
-            if map_slices[1].start < 0 <= map_slices[0].start:
-                zero_overwrite_slices[0, 1] = np.minimum(
-                    zero_overwrite_slices[0, 1],
-                    self._floor_image_array[alt_slices[0], alt_slices[1]].shape[0],
-                )
-            zero_slices = [slice(x, y) for x, y in zero_overwrite_slices]
-            floor_array[zero_slices[0], zero_slices[1]] = self._floor_image_array[
-                alt_slices[0], alt_slices[1]
-            ]
-            deco_array[zero_slices[0], zero_slices[1]] = self._deco_image_array[
-                alt_slices[0], alt_slices[1]
-            ]
-
-        self.floor_surface = make_2d_surface_from_array(
-            floor_array,
-            scaling_factor=self._scaling_factor,
-        )
-        self.deco_surface = make_2d_surface_from_array(
-            deco_array,
-            scaling_factor=self._scaling_factor,
-            color_key=(255, 0, 255),
-        )
+        view_rect = self._map_position.get_rect(self._scaling_factor)
+        view_rect.clamp_ip(self._scaled_floor_surface.get_rect())
+        self.floor_surface = self._scaled_floor_surface.subsurface(view_rect)
+        self.deco_surface = self._scaled_deco_surface.subsurface(view_rect)
+
+    @property
+    def floor_layers(self) -> list[tuple[pygame.Surface, tuple[int, int]]]:
+        """(surface, screen position) of the visible floor, like ChunkedGameMap"""
+        return [(self.floor_surface, (0, 0))]
+
+    @property
+    def deco_layers(self) -> list[tuple[pygame.Surface, tuple[int, int]]]:
+        """(surface, screen position) of the visible deco, like ChunkedGameMap"""
+        return [(self.deco_surface, (0, 0))]
+
+    def close(self):
+        """Nothing runs in the background, only there to match ChunkedGameMap"""
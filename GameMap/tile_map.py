@@ -0,0 +1,364 @@
+import collections
+import concurrent.futures
+import pathlib
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pygame
+
+from assets import asset_cache
+from GameMap.game_map import DECO_COLOR_KEY, GameMap
+from helpers import surface_counter
+
+# Tiles along each side of a chunk
+CHUNK_TILES = 16
+# Bytes the rendered chunks of a ChunkedGameMap may take up, maps that fit in
+# this much memory whole are drawn by a GameMap instead
+DEFAULT_MEMORY_BUDGET = 128 * 2**20
+# Chunks this far around the visible ones are rendered ahead of time
+PREFETCH_RADIUS = 1
+# Layers whose tiles are drawn with DECO_COLOR_KEY as transparent
+KEYED_LAYERS = ("deco",)
+
+Layer = tuple[pygame.Surface, tuple[int, int]]
+
+
+class TileMap:
+    """Map layers stored as indices into a set of tile images per layer
+
+    Saved tile maps are loaded with their indices mapped from disk, so even huge
+    maps load instantly and only the parts that get drawn are ever read.
+
+    Args:
+        indices: Tile index of every tile of every layer, as (y, x) arrays of the
+            same shape
+        tilesets: Tile images of every layer, as (tiles, y, x, channels) arrays
+
+    Attributes:
+        indices: Tile index of every tile of every layer, as (y, x) arrays
+        tilesets: Tile images of every layer, as (tiles, y, x, channels) arrays
+        tile_pixel_size: Size of a tile in pixels, as (x, y)
+    """
+
+    def __init__(
+        self,
+        indices: dict[str, npt.NDArray[np.integer]],
+        tilesets: dict[str, npt.NDArray[np.uint8]],
+    ):
+        self.indices = indices
+        self.tilesets = tilesets
+        tileset = next(iter(tilesets.values()))
+        self.tile_pixel_size = (tileset.shape[2], tileset.shape[1])
+
+    @classmethod
+    def from_images(
+        cls,
+        images: dict[str, npt.NDArray[np.uint8]],
+        tile_pixel_size: Sequence[int],
+    ) -> "TileMap":
+        """Cut image layers into tiles, storing every distinct tile only once
+
+        Args:
+            images: Image array of every layer, as (y, x, channels). Their sizes
+                must be multiples of tile_pixel_size
+            tile_pixel_size: Size of a tile in pixels, as (x, y)
+        """
+        tile_width, tile_height = (int(size) for size in tile_pixel_size)
+        indices = {}
+        tilesets = {}
+        for name, image in images.items():
+            rows = image.shape[0] // tile_height
+            cols = image.shape[1] // tile_width
+            tiles = (
+                np.asarray(image)
+                .reshape(rows, tile_height, cols, tile_width, image.shape[2])
+                .swapaxes(1, 2)
+                .reshape(rows * cols, -1)
+            )
+            unique, inverse = np.unique(tiles, axis=0, return_inverse=True)
+            tilesets[name] = unique.reshape(-1, tile_height, tile_width, image.shape[2])
+            dtype = np.uint16 if len(unique) <= 2**16 else np.uint32
+            indices[name] = inverse.reshape(rows, cols).astype(dtype)
+        return cls(indices, tilesets)
+
+    @classmethod
+    def load(cls, directory: pathlib.Path) -> "TileMap":
+        """Load a tile map written by save, mapping its indices from disk"""
+        directory = pathlib.Path(directory)
+        indices = {}
+        tilesets = {}
+        for path in sorted(directory.glob("*.tiles.npy")):
+            name = path.name.removesuffix(".tiles.npy")
+            tilesets[name] = np.load(path)
+            indices[name] = np.load(directory / f"{name}.indices.npy", mmap_mode="r")
+        if not tilesets:
+            raise FileNotFoundError(f"No tile map in {directory}")
+        return cls(indices, tilesets)
+
+    def save(self, directory: pathlib.Path):
+        """Write every layer to a directory as .npy files"""
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, indices in self.indices.items():
+            np.save(directory / f"{name}.indices.npy", indices)
+            np.save(directory / f"{name}.tiles.npy", self.tilesets[name])
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """Size of the map in tiles, as (x, y)"""
+        rows, cols = next(iter(self.indices.values())).shape
+        return cols, rows
+
+    def render(
+        self, layer: str, start: tuple[int, int], end: tuple[int, int]
+    ) -> npt.NDArray[np.uint8]:
+        """Draw the tiles from start up to end of a layer into an image array
+
+        Args:
+            layer: Name of the layer
+            start: First tile to draw, as (x, y)
+            end: Tile after the last one to draw, as (x, y)
+
+        Returns:
+            Image array of shape (y, x, channels)
+        """
+        tiles = self.tilesets[layer][
+            np.asarray(self.indices[layer][start[1] : end[1], start[0] : end[0]])
+        ]
+        rows, cols, tile_height, tile_width, channels = tiles.shape
+        return tiles.swapaxes(1, 2).reshape(
+            rows * tile_height, cols * tile_width, channels
+        )
+
+
+class ChunkedGameMap:
+    """Draws the visible part of a TileMap from chunks rendered on demand
+
+    The map is split into chunks of CHUNK_TILES by CHUNK_TILES tiles, every
+    chunk is rendered to a scaled surface once it comes close to the screen.
+    Chunks around the visible ones are rendered ahead of time on a background
+    thread, and the chunks used longest ago are dropped once they take up more
+    than memory_budget bytes, never the visible ones. Like GameMap, the view
+    can move half a screen past the edges of the map.
+
+    The background thread only draws the pixels of a chunk with numpy, the
+    surface showing them is made by update, so pygame is only ever called from
+    the thread updating the map. Drawing every update from a few surfaces is
+    faster than from chunks, so maps small enough are better drawn by GameMap,
+    see make_game_map.
+
+    Args:
+        tile_map: The map to draw
+        tiles_on_screen: How many tiles fit on screen
+        scaling_factor: Scale by which the tiles are drawn bigger
+        starting_position: Offset to start the map at
+        memory_budget: Bytes the rendered chunks may take up
+        stream: Whether to render chunks ahead of time on a background thread
+
+    Attributes:
+        floor_layers: (surface, screen position) of the visible floor chunks
+        deco_layers: (surface, screen position) of the visible deco chunks
+        chunks_rendered: How many chunk surfaces were rendered in total
+    """
+
+    def __init__(
+        self,
+        tile_map: TileMap,
+        tiles_on_screen: npt.NDArray[np.int_],
+        scaling_factor: int,
+        starting_position: npt.NDArray[np.int_],
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        stream: bool = True,
+    ):
+        self.tile_map = tile_map
+        self.memory_budget = memory_budget
+        self.chunks_rendered = 0
+        self._scaling_factor = scaling_factor
+        self._tiles_on_screen = np.array(tiles_on_screen)
+        self._position = np.array(starting_position)
+        self._tile_pixels = np.array(tile_map.tile_pixel_size) * scaling_factor
+        self._chunk_pixels = self._tile_pixels * CHUNK_TILES
+        margin_tiles = self._tiles_on_screen // 2 + 1
+        map_size = np.array(tile_map.size)
+        # The area the view is clamped to, in scaled pixels from the map's origin
+        self._bounds = pygame.Rect(
+            *(-margin_tiles * self._tile_pixels),
+            *((map_size + 2 * margin_tiles) * self._tile_pixels),
+        )
+        self._chunk_counts = -(-map_size // CHUNK_TILES)
+        self._chunks: collections.OrderedDict[
+            tuple[str, int, int], pygame.Surface
+        ] = collections.OrderedDict()
+        self._memory_used = 0
+        self._pending: dict[
+            tuple[str, int, int], concurrent.futures.Future[npt.NDArray[np.uint8]]
+        ] = {}
+        self._executor = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="map-chunks"
+            )
+            if stream
+            else None
+        )
+        self.floor_layers: list[Layer] = []
+        self.deco_layers: list[Layer] = []
+
+    @property
+    def memory_used(self) -> int:
+        """Bytes the rendered chunks take up"""
+        return self._memory_used
+
+    def _render_chunk(
+        self, layer: str, chunk_x: int, chunk_y: int
+    ) -> npt.NDArray[np.uint8]:
+        """Draw the scaled RGB pixels of a chunk, safe to call from any thread"""
+        start = (chunk_x * CHUNK_TILES, chunk_y * CHUNK_TILES)
+        end = (start[0] + CHUNK_TILES, start[1] + CHUNK_TILES)
+        # Widening first and then copying every row scaling_factor times is
+        # about three times as fast as repeating along both axes
+        wide = self.tile_map.render(layer, start, end)[:, :, :3].repeat(
+            self._scaling_factor, 1
+        )
+        scaled = np.empty(
+            (wide.shape[0], self._scaling_factor, *wide.shape[1:]), np.uint8
+        )
+        scaled[...] = wide[:, None]
+        return scaled.reshape(-1, *wide.shape[1:])
+
+    def _make_surface(self, layer: str, array: npt.NDArray[np.uint8]) -> pygame.Surface:
+        # The surface shows the array's pixels without copying them
+        surface = pygame.image.frombuffer(
+            array, (array.shape[1], array.shape[0]), "RGB"
+        )
+        if layer in KEYED_LAYERS:
+            surface.set_colorkey(DECO_COLOR_KEY)
+        return surface_counter.add(surface)
+
+    def _get_chunk(self, key: tuple[str, int, int]) -> pygame.Surface:
+        if key in self._chunks:
+            self._chunks.move_to_end(key)
+            return self._chunks[key]
+        future = self._pending.pop(key, None)
+        # A chunk still waiting for the worker is quicker to render right here
+        if future is not None and future.cancel():
+            future = None
+        array = future.result() if future is not None else self._render_chunk(*key)
+        surface = self._make_surface(key[0], array)
+        self._store(key, surface)
+        return surface
+
+    def _store(self, key: tuple[str, int, int], surface: pygame.Surface):
+        self._chunks[key] = surface
+        self._memory_used += surface.get_pitch() * surface.get_height()
+        self.chunks_rendered += 1
+
+    def _evict(self, visible: set[tuple[str, int, int]]):
+        for key in list(self._chunks):
+            if self._memory_used <= self.memory_budget:
+                break
+            if key in visible:
+                continue
+            surface = self._chunks.pop(key)
+            self._memory_used -= surface.get_pitch() * surface.get_height()
+
+    def _collect_streamed(self):
+        for key, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[key]
+                self._store(key, self._make_surface(key[0], future.result()))
+
+    def _chunk_range(self, start: int, end: int, axis: int, radius: int) -> range:
+        first = max(start // self._chunk_pixels[axis] - radius, 0)
+        last = min(
+            -(-end // self._chunk_pixels[axis]) + radius, self._chunk_counts[axis]
+        )
+        return range(first, last)
+
+    def update(self, shift_amount: tuple[int, int] | Sequence[int]):
+        """Update the map
+
+        Positions past the padding are clamped to its edge.
+
+        Args:
+            shift_amount: (x, y) amount to shift the map
+        """
+        self._position += shift_amount
+        view_rect = pygame.Rect(
+            *(self._position * self._tile_pixels),
+            *(self._tiles_on_screen * self._tile_pixels),
+        ).clamp(self._bounds)
+        self._collect_streamed()
+        visible = set()
+        self.floor_layers = []
+        self.deco_layers = []
+        for chunk_y in self._chunk_range(view_rect.top, view_rect.bottom, 1, 0):
+            for chunk_x in self._chunk_range(view_rect.left, view_rect.right, 0, 0):
+                position = (
+                    int(chunk_x * self._chunk_pixels[0] - view_rect.left),
+                    int(chunk_y * self._chunk_pixels[1] - view_rect.top),
+                )
+                for layer, layers in (
+                    ("floor", self.floor_layers),
+                    ("deco", self.deco_layers),
+                ):
+                    key = (layer, chunk_x, chunk_y)
+                    visible.add(key)
+                    layers.append((self._get_chunk(key), position))
+        self._evict(visible)
+        if self._executor is None:
+            return
+        for chunk_y in self._chunk_range(
+            view_rect.top, view_rect.bottom, 1, PREFETCH_RADIUS
+        ):
+            for chunk_x in self._chunk_range(
+                view_rect.left, view_rect.right, 0, PREFETCH_RADIUS
+            ):
+                for layer in ("floor", "deco"):
+                    key = (layer, chunk_x, chunk_y)
+                    if key not in self._chunks and key not in self._pending:
+                        self._pending[key] = self._executor.submit(
+                            self._render_chunk, *key
+                        )
+
+    def close(self):
+        """Stop rendering chunks in the background"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._pending.clear()
+
+
+def make_game_map(
+    floor_image_path: pathlib.Path | str,
+    deco_image_path: pathlib.Path | str,
+    pixels_per_tile: npt.NDArray[np.int_],
+    tiles_on_screen: npt.NDArray[np.int_],
+    scaling_factor: int,
+    starting_position: npt.NDArray[np.int_],
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> GameMap | ChunkedGameMap:
+    """Make the fastest map that fits in memory_budget
+
+    A GameMap, which scales the whole map up front, if both of its scaled and
+    padded layers take up at most memory_budget bytes, and a ChunkedGameMap
+    with that budget otherwise. Both take the arguments of GameMap.
+    """
+    floor = asset_cache.array(floor_image_path)
+    padding = 2 * (np.asarray(tiles_on_screen) // 2 + 1) * pixels_per_tile
+    layer_pixels = np.prod((floor.shape[1::-1] + padding) * scaling_factor)
+    # Both layers are drawn as RGB surfaces
+    if 2 * 3 * int(layer_pixels) <= memory_budget:
+        return GameMap(
+            floor_image_path,
+            deco_image_path,
+            pixels_per_tile,
+            tiles_on_screen,
+            scaling_factor,
+            starting_position,
+        )
+    tile_map = TileMap.from_images(
+        {"floor": floor, "deco": asset_cache.array(deco_image_path)}, pixels_per_tile
+    )
+    return ChunkedGameMap(
+        tile_map, tiles_on_screen, scaling_factor, starting_position, memory_budget
+    )
@@ -0,0 +1,103 @@
+from collections import deque
+
+import numpy as np
+import numpy.typing as npt
+
+# Flags of a tile in a CollisionGrid
+SOLID = 1
+INTERACTABLE = 2
+# The deco layer is drawn over the player while on the tile
+OCCLUDING = 4
+# Blue value of the collision map pixels where the player walks behind the deco
+OCCLUDING_BLUE = 133
+
+
+class CollisionGrid:
+    """Collision map compiled into one byte of flags per tile
+
+    Touching interactable tiles make up one interactable, which opens the puzzle
+    with its id. Interactables get ids in the order they are first found going
+    through the map row by row.
+
+    Args:
+        collision_map: RGB(A) collision map image array, as (y, x, channels).
+            Red pixels are solid, green ones interactable and ones with a blue
+            value of OCCLUDING_BLUE are behind the deco layer
+
+    Attributes:
+        flags: SOLID, INTERACTABLE and OCCLUDING of every tile, indexed (x, y)
+        puzzle_ids: The puzzle id of every interactable tile, by (x, y)
+        puzzle_count: How many interactables there are
+        version: Goes up every time a tile changes, for caches built from the grid
+    """
+
+    def __init__(self, collision_map: npt.NDArray[np.uint8]):
+        tiles = collision_map.swapaxes(0, 1)
+        flags = np.zeros(tiles.shape[:2], np.uint8)
+        flags[tiles[:, :, 0] != 0] |= SOLID
+        flags[tiles[:, :, 1] != 0] |= INTERACTABLE
+        flags[tiles[:, :, 2] == OCCLUDING_BLUE] |= OCCLUDING
+        self.flags = flags
+        self.puzzle_ids: dict[tuple[int, int], int] = {}
+        self.puzzle_count = 0
+        self.version = 0
+        for y in range(flags.shape[1]):
+            for x in np.flatnonzero(flags[:, y] & INTERACTABLE):
+                if (x, y) not in self.puzzle_ids:
+                    self._label((int(x), y), self.puzzle_count)
+                    self.puzzle_count += 1
+
+    def _label(self, start: tuple[int, int], puzzle_id: int):
+        self.puzzle_ids[start] = puzzle_id
+        queue = deque([start])
+        while queue:
+            x, y = queue.popleft()
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if (
+                    0 <= neighbor[0] < self.flags.shape[0]
+                    and 0 <= neighbor[1] < self.flags.shape[1]
+                    and self.flags[neighbor] & INTERACTABLE
+                    and neighbor not in self.puzzle_ids
+                ):
+                    self.puzzle_ids[neighbor] = puzzle_id
+                    queue.append(neighbor)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Size of the grid in tiles, as (x, y)"""
+        return self.flags.shape
+
+    def is_walkable(self, position: tuple[int, int]) -> bool:
+        """Whether the player can stand on a tile, False outside the grid"""
+        return (
+            0 <= position[0] < self.flags.shape[0]
+            and 0 <= position[1] < self.flags.shape[1]
+            and not self.flags[position] & (SOLID | INTERACTABLE)
+        )
+
+    def set_flags(
+        self, position: tuple[int, int], flags: int, puzzle_id: int | None = None
+    ):
+        """Change a tile, for example to open a door
+
+        Args:
+            position: The tile, as (x, y)
+            flags: New flags of the tile
+            puzzle_id: Puzzle the tile opens, needed if flags has INTERACTABLE
+
+        Raises:
+            ValueError: flags has INTERACTABLE but no puzzle_id is given
+        """
+        if flags & INTERACTABLE and puzzle_id is None:
+            raise ValueError("Interactable tiles need a puzzle id")
+        self.flags[position] = flags
+        if puzzle_id is not None and flags & INTERACTABLE:
+            self.puzzle_ids[position] = puzzle_id
+            self.puzzle_count = max(self.puzzle_count, puzzle_id + 1)
+        else:
+            self.puzzle_ids.pop(position, None)
+        self.version += 1
+
+    def puzzle_at(self, position: tuple[int, int]) -> int | None:
+        """Get the puzzle id of a tile, None if it is not interactable"""
+        return self.puzzle_ids.get(position)
@@ -0,0 +1,194 @@
+import heapq
+import weakref
+
+import numpy as np
+import numpy.typing as npt
+
+from Player.collision_grid import INTERACTABLE, SOLID, CollisionGrid
+
+UNREACHABLE = -1
+# Steps the player can take, the same as the movement directions
+STEPS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+# Tiles find_path looks at before giving up, a few times what any tile on screen
+# takes, so a click can never stall a frame for more than about 20 ms
+PATH_MAX_NODES = 5000
+# (grid version, walkable tiles) of every grid, rebuilt when the grid changes
+_walkable_cache: weakref.WeakKeyDictionary[
+    CollisionGrid, tuple[int, bytes]
+] = weakref.WeakKeyDictionary()
+
+
+def find_path(
+    grid: CollisionGrid,
+    start: tuple[int, int],
+    goal: tuple[int, int],
+    max_nodes: int = PATH_MAX_NODES,
+) -> list[tuple[int, int]] | None:
+    """Find a shortest path between two tiles with A*
+
+    The goal itself does not need to be walkable, so a path can end by walking
+    into an interactable, which is how the player uses one.
+
+    Args:
+        grid: The grid to route over
+        start: Tile to start from, as (x, y)
+        goal: Tile to get to, as (x, y)
+        max_nodes: Most tiles to look at before giving up
+
+    Returns:
+        The tiles after start up to and including goal, None if the goal
+        cannot be reached or was not found within max_nodes tiles
+    """
+    start = (int(start[0]), int(start[1]))
+    goal = (int(goal[0]), int(goal[1]))
+    if start == goal:
+        return []
+    width, height = grid.shape
+    if not (0 <= goal[0] < width and 0 <= goal[1] < height):
+        return None
+    # Tiles are searched by index into the grid with a border of blocked tiles,
+    # so neighbors are found by adding offsets and never leave the grid
+    padded_height = height + 2
+    walkable = _walkable_tiles(grid)
+    goal_index = (goal[0] + 1) * padded_height + goal[1] + 1
+    offsets = [x * padded_height + y for x, y in STEPS]
+    start_index = (start[0] + 1) * padded_height + start[1] + 1
+    came_from = {start_index: start_index}
+    costs = {start_index: 0}
+    # (cost + distance left, distance left, tile), ties go to the tile closer to
+    # the goal so that the search heads straight for it
+    queue = [(0, 0, start_index)]
+    while queue and max_nodes > 0:
+        max_nodes -= 1
+        _, _, index = heapq.heappop(queue)
+        if index == goal_index:
+            path = []
+            while index != start_index:
+                x, y = divmod(index, padded_height)
+                path.append((x - 1, y - 1))
+                index = came_from[index]
+            return path[::-1]
+        cost = costs[index] + 1
+        for offset in offsets:
+            neighbor = index + offset
+            if not (walkable[neighbor] or neighbor == goal_index):
+                continue
+            if costs.get(neighbor, cost + 1) <= cost:
+                continue
+            costs[neighbor] = cost
+            came_from[neighbor] = index
+            x, y = divmod(neighbor, padded_height)
+            left = abs(goal[0] + 1 - x) + abs(goal[1] + 1 - y)
+            heapq.heappush(queue, (cost + left, left, neighbor))
+    return None
+
+
+def _walkable_tiles(grid: CollisionGrid) -> bytes:
+    """Whether every tile can be walked on, flattened with a blocked border
+
+    Kept until the grid changes, as building it goes over the whole grid.
+    Reading bytes is a lot quicker than reading numpy arrays one item at a time.
+    """
+    cached = _walkable_cache.get(grid)
+    if cached is not None and cached[0] == grid.version:
+        return cached[1]
+    walkable = np.zeros(np.add(grid.shape, 2), bool)
+    walkable[1:-1, 1:-1] = (grid.flags & (SOLID | INTERACTABLE)) == 0
+    _walkable_cache[grid] = (grid.version, walkable.tobytes())
+    return _walkable_cache[grid][1]
+
+
+class DistanceFields:
+    """Distances from every tile to every interactable, for routing to puzzles
+
+    The field of every interactable is built with a breadth first search up
+    front, and built again by refresh once the grid changed, so following one
+    to a puzzle only looks at the tiles along the way.
+
+    Args:
+        grid: The grid to route over
+    """
+
+    def __init__(self, grid: CollisionGrid):
+        self.grid = grid
+        self._fields: dict[int, npt.NDArray[np.int32]] = {}
+        self._version = -1
+        self.refresh()
+
+    def refresh(self):
+        """Build every field again if the grid changed since they were built
+
+        Building a field goes over the whole grid, call this right after
+        changing the grid, for example while a door opens, so that the next
+        walk to a puzzle does not have to.
+        """
+        if self._version == self.grid.version:
+            return
+        self._fields = {
+            puzzle_id: self._build(puzzle_id)
+            for puzzle_id in sorted(set(self.grid.puzzle_ids.values()))
+        }
+        self._version = self.grid.version
+
+    def field(self, puzzle_id: int) -> npt.NDArray[np.int32]:
+        """Get the steps from every tile to an interactable
+
+        Returns:
+            Array indexed (x, y), 0 on the interactable's tiles and UNREACHABLE
+            where it cannot be walked to from
+        """
+        self.refresh()
+        if puzzle_id not in self._fields:
+            self._fields[puzzle_id] = self._build(puzzle_id)
+        return self._fields[puzzle_id]
+
+    def _build(self, puzzle_id: int) -> npt.NDArray[np.int32]:
+        walkable = np.frombuffer(_walkable_tiles(self.grid), bool)
+        field = np.full(walkable.shape, UNREACHABLE, np.int32)
+        height = self.grid.shape[1] + 2
+        offsets = np.array([x * height + y for x, y in STEPS])
+        frontier = np.array(
+            [
+                (x + 1) * height + y + 1
+                for (x, y), tile_puzzle in self.grid.puzzle_ids.items()
+                if tile_puzzle == puzzle_id
+            ],
+            np.int64,
+        )
+        field[frontier] = 0
+        distance = 0
+        while frontier.size:
+            distance += 1
+            reached = np.unique((frontier[:, None] + offsets).ravel())
+            frontier = reached[walkable[reached] & (field[reached] == UNREACHABLE)]
+            field[frontier] = distance
+        return field.reshape(np.add(self.grid.shape, 2))[1:-1, 1:-1]
+
+    def path_to_puzzle(
+        self, start: tuple[int, int], puzzle_id: int
+    ) -> list[tuple[int, int]] | None:
+        """Follow a distance field downhill to the closest tile of an interactable
+
+        Returns:
+            The tiles after start up to and including the interactable's tile,
+            None if it cannot be reached
+        """
+        field = self.field(puzzle_id)
+        tile = (int(start[0]), int(start[1]))
+        distance = field[tile]
+        if distance == UNREACHABLE:
+            return None
+        path = []
+        while distance > 0:
+            for step_x, step_y in STEPS:
+                neighbor = (tile[0] + step_x, tile[1] + step_y)
+                if (
+                    0 <= neighbor[0] < field.shape[0]
+                    and 0 <= neighbor[1] < field.shape[1]
+                    and field[neighbor] == distance - 1
+                ):
+                    break
+            tile = neighbor
+            distance -= 1
+            path.append(tile)
+        return path
@@ -1,13 +1,17 @@
+import functools
+import time
+from collections import deque
 from enum import Enum
 from typing import Sequence
 
 import numpy as np
-import numpy.typing
-import PIL
 import pygame
 import pygame.event
 
-from helpers import EventHandler, EventTypes, make_2d_surface_from_array
+from assets import asset_cache
+from helpers import EventHandler, EventTypes, SpriteAtlas
+from Player.collision_grid import INTERACTABLE, OCCLUDING, SOLID, CollisionGrid
+from Player.pathfinding import DistanceFields, find_path
 
 
 class MovementDirections(Enum):
@@ -27,12 +31,43 @@ KEYPRESS_ALTERNATIVES: dict[int, MovementDirections] = {
     **dict.fromkeys([pygame.K_d, pygame.K_RIGHT], MovementDirections.RIGHT),
 }
 
-PLAYER_SPRITES: dict[MovementDirections, numpy.typing.NDArray] = {
-    MovementDirections.UP: np.array(PIL.Image.open("Player/player_up.png")),
-    MovementDirections.DOWN: np.array(PIL.Image.open("Player/player_down.png")),
-    MovementDirections.LEFT: np.array(PIL.Image.open("Player/player_left.png")),
-    MovementDirections.RIGHT: np.array(PIL.Image.open("Player/player_right.png")),
+PLAYER_SPRITES: dict[MovementDirections, str] = {
+    MovementDirections.UP: "Player/player_up.png",
+    MovementDirections.DOWN: "Player/player_down.png",
+    MovementDirections.LEFT: "Player/player_left.png",
+    MovementDirections.RIGHT: "Player/player_right.png",
 }
+COLLISION_MAP = "Player/collision_map.png"
+# Seconds between the steps of a walk to a clicked tile
+PATH_STEP_TIME = 0.08
+
+# Scaled sprite atlases, one per scaling factor, holding every direction's frames
+_player_atlases: dict[int, SpriteAtlas] = {}
+
+
+def get_player_atlas(scaling_factor: int) -> SpriteAtlas:
+    """Get the player sprite atlas for a scaling factor, building it on first use"""
+    if scaling_factor not in _player_atlases:
+        _player_atlases[scaling_factor] = SpriteAtlas(
+            {
+                direction: [asset_cache.array(path)]
+                for direction, path in PLAYER_SPRITES.items()
+            },
+            scaling_factor,
+        )
+    return _player_atlases[scaling_factor]
+
+
+@functools.lru_cache
+def get_collision_grid() -> CollisionGrid:
+    """Get the compiled collision map, compiling it on first use"""
+    return CollisionGrid(asset_cache.array(COLLISION_MAP))
+
+
+@functools.lru_cache
+def get_distance_fields() -> DistanceFields:
+    """Get the distance fields of the collision grid, shared by every player"""
+    return DistanceFields(get_collision_grid())
 
 
 class Player:
@@ -41,15 +76,15 @@ class Player:
     def __init__(
         self, scaling_factor: int, starting_position: tuple[int, int] | Sequence[int]
     ):
-        self.image = make_2d_surface_from_array(
-            PLAYER_SPRITES[MovementDirections.DOWN], scaling_factor=scaling_factor
-        )
+        self._sprites = get_player_atlas(scaling_factor)
+        self.image = self._sprites.get(MovementDirections.DOWN)
         self.position = np.array(starting_position)
         self._scaling_factor = scaling_factor
-        self._collision_map = np.array(
-            PIL.Image.open("Player/collision_map.png")
-        ).swapaxes(0, 1)
+        self.collision_grid = get_collision_grid()
+        self.distance_fields = get_distance_fields()
         self.z_layer = 0
+        self._path: deque[MovementDirections] = deque()
+        self._next_step_time = 0.0
 
     def loop(self, event: pygame.event.EventType):
         """Player update method"""
@@ -57,22 +92,83 @@ class Player:
             return
         if all(event.key != alternatives for alternatives in KEYPRESS_ALTERNATIVES):
             return
-        movement_direction = KEYPRESS_ALTERNATIVES[event.key]
-        sprite = PLAYER_SPRITES[movement_direction]
-        self.image = make_2d_surface_from_array(
-            sprite, scaling_factor=self._scaling_factor
+        # Walking by hand stops a walk to a clicked tile
+        self._path.clear()
+        self.move(KEYPRESS_ALTERNATIVES[event.key])
+
+    def move(self, movement_direction: MovementDirections) -> bool:
+        """Turn and take a step, or walk into an interactable to use it
+
+        Returns:
+            Whether the player moved
+        """
+        self.image = self._sprites.get(movement_direction)
+        tile_to_check = (
+            int(self.position[0]) + movement_direction.value[0],
+            int(self.position[1]) + movement_direction.value[1],
         )
-        pixel_to_check = np.array(self.position + movement_direction.value)
-        if self._collision_map[pixel_to_check[0], pixel_to_check[1], 0]:
+        flags = self.collision_grid.flags[tile_to_check]
+        if flags & SOLID:
             movement_direction = MovementDirections.NULL
-        elif self._collision_map[pixel_to_check[0], pixel_to_check[1], 1]:
+        elif flags & INTERACTABLE:
             movement_direction = MovementDirections.NULL
-            EventHandler.add(EventTypes.INTERACTION_EVENT, pixel_to_check)
-            # not 127 and I don't know why
-        elif self._collision_map[pixel_to_check[0], pixel_to_check[1], 2] == 133:
-            self.z_layer = 1
+            EventHandler.add(
+                EventTypes.INTERACTION_EVENT,
+                self.collision_grid.puzzle_at(tile_to_check),
+            )
         else:
-            self.z_layer = 0
+            self.z_layer = 1 if flags & OCCLUDING else 0
         self.position += movement_direction.value
         EventHandler.add(EventTypes.PLAYER_SPRITE_UPDATE)
         EventHandler.add(EventTypes.MAP_POSITION_UPDATE, movement_direction.value)
+        return movement_direction != MovementDirections.NULL
+
+    def walk_to(self, tile: tuple[int, int] | Sequence[int]) -> bool:
+        """Start walking to a tile, and into it if it is an interactable
+
+        Walking to an interactable follows its cached distance field to its
+        closest tile, any other tile is found with A*.
+
+        Returns:
+            Whether the tile can be reached
+        """
+        tile = (int(tile[0]), int(tile[1]))
+        puzzle_id = self.collision_grid.puzzle_at(tile)
+        if puzzle_id is not None:
+            path = self.distance_fields.path_to_puzzle(self.position, puzzle_id)
+        elif self.collision_grid.is_walkable(tile):
+            path = find_path(self.collision_grid, self.position, tile)
+        else:
+            path = None
+        self._path.clear()
+        if path is None:
+            return False
+        previous = tuple(self.position)
+        for step in path:
+            self._path.append(
+                MovementDirections((step[0] - previous[0], step[1] - previous[1]))
+            )
+            previous = step
+        self._next_step_time = time.perf_counter()
+        return True
+
+    def follow_path(self) -> bool:
+        """Take the next step of a walk to a clicked tile once it is time to
+
+        Call this every frame, the walk stops if something is in the way.
+
+        Returns:
+            Whether the walk goes on, so the next frame must not idle
+        """
+        if not self._path:
+            return False
+        now = time.perf_counter()
+        if now < self._next_step_time:
+            return True
+        # Keep the pace of the walk, unless a frame took longer than a step
+        self._next_step_time = (
+            max(self._next_step_time, now - PATH_STEP_TIME) + PATH_STEP_TIME
+        )
+        if not self.move(self._path.popleft()):
+            self._path.clear()
+        return bool(self._path)
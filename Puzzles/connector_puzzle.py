@@ -1,11 +1,20 @@
-import random
+import pathlib
+from collections import deque
 
 import numpy as np
-import PIL
+import PIL.Image
 import pygame
 
-from helpers import EventHandler, EventTypes
+from assets import asset_cache
+from helpers import EventHandler, EventTypes, surface_counter
 from puzzle import Puzzle
+from Puzzles.connector_solver import (
+    FREE,
+    ConnectorSolver,
+    get_solver,
+    is_solution,
+    neighbor_lists,
+)
 
 COLORS = [
     (0xFF, 0xFF, 0xFF),
@@ -13,6 +22,7 @@ COLORS = [
     (0x00, 0xFF, 0x00),
     (0x00, 0x00, 0xFF),
 ]
+HINT_MAX_NODES = 2000
 
 
 class Connector(Puzzle):
@@ -20,21 +30,63 @@ class Connector(Puzzle):
     Summary
 
     This is the connector puzzle, where you click pieces to change their color.
+    It is solved when all pieces of every color other than white touch.
+
+    Args:
+        difficulty:
+            from 0 to 1, how many tiles are locked and how far apart, see
+            ConnectorSolver.generate
+
+    Attributes:
+        tiles:
+            index into COLORS of the color of every tile. Pieces are drawn from one
+            pre-rendered surface per color, so recoloring allocates no pixels
+
+        component_counts:
+            how many separate groups of touching tiles every color in COLORS has,
+            kept up to date on every click so checking is_solved is cheap
+
+        clues:
+            FREE for every tile the player can click, otherwise its locked color
+
+        solution:
+            the colors the board was generated from, which solve the puzzle
     """
 
     def __init__(
         self,
         # not required:
-        image: PIL.Image.Image,
+        image: PIL.Image.Image | str | pathlib.Path,
         pieces_per_side: int,
         output_size: tuple[int, int],
         puzzle_pos: tuple[int, int] = (0, 0),
+        difficulty: float = 0.5,
     ):
-        real_image = PIL.Image.new(image.mode, image.size, color=0xFFFFFF)
+        if not isinstance(image, PIL.Image.Image):
+            image = asset_cache.image(image)
+        real_image = PIL.Image.new("RGB", image.size, color=0xFFFFFF)
         super().__init__(real_image, pieces_per_side, output_size, puzzle_pos)
-        self.color_list = [COLORS[0]] * self.total_pieces
+        self.tiles = np.zeros(self.total_pieces, np.uint8)
+        # Every color is rendered once, recoloring a tile only swaps which is used
+        piece_shape = self.piece_images.shape[2:]
+        self._color_images = [
+            np.broadcast_to(np.array(color, np.uint8), piece_shape) for color in COLORS
+        ]
+        self._color_surfaces = []
+        for color in COLORS:
+            surface = surface_counter.add(pygame.Surface(self.puzzle_scale))
+            surface.fill(color)
+            self._color_surfaces.append(surface)
         self.locked = [False] * self.total_pieces
-        self.scramble()
+        self._neighbors = neighbor_lists(pieces_per_side)
+        # Component label of every tile and the tiles of every label
+        self._labels = [-1] * self.total_pieces
+        self._members: dict[int, set[int]] = {}
+        self._next_label = 0
+        self.component_counts = [0] * len(COLORS)
+        for tile in range(self.total_pieces):
+            self._attach(tile)
+        self.scramble(difficulty)
         self.generate_orderlist()
         self.image_update()
 
@@ -42,75 +94,169 @@ class Connector(Puzzle):
         """Put your loop code here"""
         if event.type == pygame.MOUSEBUTTONUP:
             tile = self.get_tile_index_from_pos(pygame.mouse.get_pos())
+            if tile is None:
+                return
             self.click_tile(tile, event.button == 3)
-            self.image_update()
-            EventHandler.add(EventTypes.PUZZLE_SPRITE_UPDATE)
+            self.image_update([tile])
 
             if self.is_solved():
                 EventHandler.add(EventTypes.PUZZLE_SOLVED)
 
+    @property
+    def color_list(self) -> list[tuple[int, int, int]]:
+        """The color of every tile"""
+        return [COLORS[color] for color in self.tiles]
+
     def click_tile(self, tile: int, reverse: bool):
         """Change the colors of a tile"""
         if self.locked[tile]:
             return
 
         direction = -1 if reverse else 1
-        color_idx = (COLORS.index(self.color_list[tile]) + direction) % len(COLORS)
-        self.color_list[tile] = COLORS[color_idx]
-        shape = self.pieces[tile].image.shape
-
-        self.pieces[tile].image = np.reshape(
-            np.tile(
-                self.color_list[tile],
-                shape[0] * shape[1],
-            ),
-            shape,
-        )
+        self.set_color(tile, (int(self.tiles[tile]) + direction) % len(COLORS))
+
+    def set_color(self, tile: int, color: int):
+        """Give a tile the color COLORS[color], even if it is locked"""
+        self._detach(tile)
+        self.tiles[tile] = color
+        self._attach(tile)
+        self.pieces[tile].image = self._color_images[color]
+
+    def get_piece_surface(self, piece_index: int) -> pygame.Surface:
+        """Returns the shared surface of the color of the piece"""
+        return self._color_surfaces[self.tiles[piece_index]]
 
     def is_solved(self) -> bool:
-        """Check whether the connector puzzle is solved."""
-        tiles = np.reshape(
-            [COLORS.index(c) for c in self.color_list],
-            (self.pieces_per_side, self.pieces_per_side),
-        )
-        # essentially, confirm that every piece of a color (other than white) is
-        # connected
-        for i in range(1, len(COLORS)):
-            # turn into an array of True / False
-            locations = np.argwhere(tiles == i)
-            connected = set()
-
-            if len(locations) < 2:
-                continue
-
-            connected.add(tuple(locations[0]))
-            locs = set(map(tuple, locations[1:]))
-            checking = [locations[0]]
-            while checking:
-                location = checking.pop()
-                for neighbor in (
-                    location + (1, 0),
-                    location + (0, 1),
-                    location + (-1, 0),
-                    location + (0, -1),
-                ):
-                    if tuple(neighbor) in locs and tuple(neighbor) not in connected:
-                        connected.add(tuple(neighbor))
-                        checking.append(neighbor)
-
-            if len(locations) != len(connected):
-                return False
-
-        return True
-
-    def scramble(self) -> None:
-        """Put the code to scramble your puzzle here"""
-        # for _ in range(self.total_pieces):
-        #     self.invert(self.get_neighbors(random.randint(0, self.total_pieces - 1)))
-        for i in range(self.total_pieces):
-            # TODO: this might not be solve-able
-            if random.random() < 0.10:
-                for _ in range(int(random.random() * 4)):
-                    self.click_tile(i, False)
-                self.locked[i] = True
+        """Check whether every color other than white is one connected group"""
+        return all(count <= 1 for count in self.component_counts[1:])
+
+    def _attach(self, tile: int):
+        """Add a tile to the components of its color, merging the ones it touches"""
+        color = self.tiles[tile]
+        touching = {
+            self._labels[neighbor]
+            for neighbor in self._neighbors[tile]
+            if self._labels[neighbor] != -1 and self.tiles[neighbor] == color
+        }
+        if not touching:
+            label = self._next_label
+            self._next_label += 1
+            self._members[label] = set()
+        else:
+            # Relabel the smaller components into the largest one
+            label = max(touching, key=lambda touched: len(self._members[touched]))
+            for other in touching - {label}:
+                merged = self._members.pop(other)
+                for member in merged:
+                    self._labels[member] = label
+                self._members[label] |= merged
+        self._labels[tile] = label
+        self._members[label].add(tile)
+        self.component_counts[color] += 1 - len(touching)
+
+    def _detach(self, tile: int):
+        """Remove a tile from its component, splitting it if the tile held it together
+
+        The neighbors of the tile that were in its component are searched from
+        in turns. Searches that meet are merged, and a search that runs out of
+        tiles before only one is left has found a part that split off, so the
+        work is bounded by the smaller parts rather than the whole component.
+        """
+        label = self._labels[tile]
+        color = self.tiles[tile]
+        labels = self._labels
+        neighbors = self._neighbors
+        self._members[label].discard(tile)
+        labels[tile] = -1
+        seeds = [neighbor for neighbor in neighbors[tile] if labels[neighbor] == label]
+        if not seeds:
+            del self._members[label]
+            self.component_counts[color] -= 1
+            return
+
+        owner = {seed: search for search, seed in enumerate(seeds)}
+        parent = list(range(len(seeds)))
+        frontiers = [deque([seed]) for seed in seeds]
+        searches = set(range(len(seeds)))
+
+        def find(search: int) -> int:
+            while parent[search] != search:
+                search = parent[search]
+            return search
+
+        while len(searches) > 1:
+            for search in sorted(searches):
+                if search not in searches:
+                    continue
+                frontier = frontiers[search]
+                if not frontier:
+                    searches.discard(search)
+                    split = {
+                        member
+                        for member, found_by in owner.items()
+                        if find(found_by) == search
+                    }
+                    for member in split:
+                        labels[member] = self._next_label
+                    self._members[self._next_label] = split
+                    self._members[label] -= split
+                    self._next_label += 1
+                    self.component_counts[color] += 1
+                    if len(searches) == 1:
+                        break
+                    continue
+                current = frontier.popleft()
+                for neighbor in neighbors[current]:
+                    if labels[neighbor] != label:
+                        continue
+                    found_by = owner.get(neighbor)
+                    if found_by is None:
+                        owner[neighbor] = search
+                        frontier.append(neighbor)
+                    elif (found_by := find(found_by)) != search:
+                        parent[found_by] = search
+                        frontier.extend(frontiers[found_by])
+                        searches.discard(found_by)
+
+    @property
+    def solver(self) -> ConnectorSolver:
+        """The solver for this puzzle's size"""
+        return get_solver(self.pieces_per_side)
+
+    def scramble(self, difficulty: float = 0.5):
+        """Lock tiles of a generated board, which always has a solution"""
+        self.clues, self.solution = self.solver.generate(len(COLORS) - 1, difficulty)
+        for tile, clue in enumerate(self.clues):
+            self.locked[tile] = clue != FREE
+            self.set_color(tile, max(clue, 0))
         self.image_update()
+
+    def solve(self) -> list[int]:
+        """Get the index into COLORS of every tile of a solution
+
+        Tries to find one with the solver first, which may differ from the
+        generated solution, and falls back to that if it takes too long.
+        """
+        found = self.solver.solve(self.clues, HINT_MAX_NODES)
+        return self.solution if found is None else found
+
+    def hint(self) -> int | None:
+        """Get a tile that has to change color for a solution
+
+        Returns:
+            The tile, or None if the puzzle is solved or no valid solution was
+            found
+        """
+        if self.is_solved():
+            return None
+        solution = self.solve()
+        if not is_solution(self.clues, solution, self.pieces_per_side):
+            return None
+        return next(
+            (
+                tile
+                for tile in range(self.total_pieces)
+                if self.tiles[tile] != solution[tile]
+            ),
+            None,
+        )
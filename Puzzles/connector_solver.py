@@ -0,0 +1,561 @@
+import functools
+import itertools
+import random
+from collections import deque
+from typing import Sequence
+
+# Clue of a tile the player can color, every other clue is the color it is locked to
+FREE = -1
+WHITE = 0
+# Tiles locked per color and the share of the board the colors take, at difficulty
+# 0 and 1, difficulties in between are interpolated
+TERMINALS = (2, 5)
+COVERAGE = (0.2, 0.5)
+# Share of the tiles no color needs that are locked white, at difficulty 0 and 1
+OBSTACLES = (0.0, 0.15)
+# Where a tile was found from before a search has found it
+UNSEEN = -1
+# Color orders solve routes the colors in, and routes with shuffled tie breaks
+# tried after that, before falling back to searching
+ROUTE_ORDERS = 24
+ROUTE_SHUFFLES = 16
+# Branches the first search of a solve may take, every restart gets twice as many
+RESTART_NODES = 64
+# Layouts generate tries before giving up on a board
+GENERATE_ATTEMPTS = 1000
+
+
+def _lerp(bounds: tuple[float, float], amount: float) -> float:
+    return bounds[0] + (bounds[1] - bounds[0]) * amount
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_lists(size: int) -> tuple[tuple[int, ...], ...]:
+    """Get the tiles next to every tile of a size x size board, built once per size"""
+    cells = size * size
+    return tuple(
+        tuple(
+            neighbor
+            for neighbor, valid in (
+                (tile - size, tile >= size),
+                (tile + size, tile < cells - size),
+                (tile - 1, tile % size != 0),
+                (tile + 1, tile % size != size - 1),
+            )
+            if valid
+        )
+        for tile in range(cells)
+    )
+
+
+def is_solution(clues: Sequence[int], colors: Sequence[int], size: int) -> bool:
+    """Whether colors keeps every locked tile and connects every color but white
+
+    Args:
+        clues: FREE or the locked color of every tile
+        colors: Color of every tile
+        size: Tiles per side
+    """
+    if any(clue not in (FREE, color) for clue, color in zip(clues, colors)):
+        return False
+    neighbors = neighbor_lists(size)
+    seen_colors = set()
+    seen = [False] * len(colors)
+    for tile, color in enumerate(colors):
+        if color == WHITE or seen[tile]:
+            continue
+        if color in seen_colors:
+            return False
+        seen_colors.add(color)
+        seen[tile] = True
+        stack = [tile]
+        while stack:
+            for neighbor in neighbors[stack.pop()]:
+                if not seen[neighbor] and colors[neighbor] == color:
+                    seen[neighbor] = True
+                    stack.append(neighbor)
+    return True
+
+
+class ConnectorSolver:
+    """Finds a way to connect the locked tiles of every color of a Connector board
+
+    Most boards are solved by routing the colors one after the other along
+    shortest paths, trying other color orders and tie breaks when a color gets
+    walled off by the ones before it. Boards where that fails are searched:
+    colors are grown one tile at a time, finishing the connection that was grown
+    last before starting on the part of a color with the fewest free tiles
+    around it. Free tiles that every way of connecting a color passes through
+    are given to it straight away, and a color whose parts can no longer reach
+    each other ends the branch. A tile that was tried and failed is banned for
+    that color in the following branches, so no set of tiles is searched twice.
+    Searches restart with other tie breaks and twice the branches whenever they
+    run out, so one unlucky early choice does not stall the whole solve.
+
+    Args:
+        size: Tiles per side
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.cells = size * size
+        self._neighbors = neighbor_lists(size)
+
+    def _parts(self, colors: list[int], color: int) -> list[list[int]]:
+        """Get the groups of touching tiles of a color"""
+        neighbors = self._neighbors
+        seen = set()
+        parts = []
+        for tile in range(self.cells):
+            if colors[tile] != color or tile in seen:
+                continue
+            seen.add(tile)
+            part = [tile]
+            for current in part:
+                for neighbor in neighbors[current]:
+                    if colors[neighbor] == color and neighbor not in seen:
+                        seen.add(neighbor)
+                        part.append(neighbor)
+            parts.append(part)
+        return parts
+
+    def _required_tiles(
+        self, colors: list[int], color: int, parts: list[list[int]], banned: set[int]
+    ) -> set[int] | None:
+        """Get the free tiles every way of connecting the parts of a color uses
+
+        These are the cut vertices, found with Tarjan's depth first search over
+        the tiles the color may use, that have parts on both sides.
+
+        Returns:
+            The tiles, or None if the parts cannot be connected at all
+        """
+        neighbors = self._neighbors
+        start = parts[0][0]
+        order = {start: 0}
+        low = {start: 0}
+        # Tiles of the color in the search tree below every tile
+        below = {start: 1}
+        parent = {start: -1}
+        required = set()
+        stack = [(start, iter(neighbors[start]))]
+        while stack:
+            tile, unvisited = stack[-1]
+            for neighbor in unvisited:
+                if neighbor in banned or colors[neighbor] not in (FREE, color):
+                    continue
+                if neighbor not in order:
+                    order[neighbor] = low[neighbor] = len(order)
+                    below[neighbor] = colors[neighbor] == color
+                    parent[neighbor] = tile
+                    stack.append((neighbor, iter(neighbors[neighbor])))
+                    break
+                if neighbor != parent[tile]:
+                    low[tile] = min(low[tile], order[neighbor])
+            else:
+                stack.pop()
+                above = parent[tile]
+                if above == -1:
+                    continue
+                low[above] = min(low[above], low[tile])
+                below[above] += below[tile]
+                # The start is a tile of the color, so if this subtree has one too
+                # a free tile cutting it off joins them
+                if low[tile] >= order[above] and colors[above] == FREE and below[tile]:
+                    required.add(above)
+        if any(part[0] not in order for part in parts[1:]):
+            return None
+        return required
+
+    def solve(
+        self, clues: Sequence[int], max_nodes: int | None = None
+    ) -> list[int] | None:
+        """Find colors for every tile that connect every color
+
+        Args:
+            clues: FREE or the locked color of every tile
+            max_nodes: Give up after this many branches, None to never
+
+        Returns:
+            The color of every tile, tiles no color needs are WHITE, or None if
+            max_nodes ran out
+
+        Raises:
+            ValueError: The board cannot be solved
+        """
+        palette = sorted({clue for clue in clues if clue > WHITE})
+        for order in itertools.islice(itertools.permutations(palette), ROUTE_ORDERS):
+            solution = self._route(clues, order, self._neighbors)
+            if solution is not None:
+                return solution
+        rng = random.Random(0)
+        for _ in range(ROUTE_SHUFFLES):
+            neighbors = [rng.sample(tiles, len(tiles)) for tiles in self._neighbors]
+            solution = self._route(clues, rng.sample(palette, len(palette)), neighbors)
+            if solution is not None:
+                return solution
+        budget, spent, attempt = RESTART_NODES, 0, 0
+        while True:
+            if max_nodes is not None:
+                budget = min(budget, max_nodes - spent)
+                if budget <= 0:
+                    return None
+            try:
+                return self._search(clues, budget, random.Random(attempt))
+            except TimeoutError:
+                spent += budget
+                budget *= 2
+                attempt += 1
+
+    def _route(
+        self,
+        clues: Sequence[int],
+        order: Sequence[int],
+        neighbors: Sequence[Sequence[int]],
+    ) -> list[int] | None:
+        """Connect the colors one after the other along shortest paths
+
+        Every color grows a tree from one of its parts by adding the shortest
+        path through free tiles to the closest part it does not reach yet.
+        Colors routed earlier are walls for the later ones.
+
+        Args:
+            clues: FREE or the locked color of every tile
+            order: The colors in the order they are routed
+            neighbors: The tiles next to every tile, their order breaks ties
+
+        Returns:
+            The color of every tile as solve returns it, or None if a color got
+            walled off
+        """
+        colors = list(clues)
+        for color in order:
+            tree: set[int] = set()
+            for terminal in range(self.cells):
+                if clues[terminal] != color:
+                    continue
+                reached = terminal
+                # The closest part may not be the terminal's, so connect until it is
+                while terminal not in tree:
+                    if tree:
+                        reached = self._extend(colors, color, tree, neighbors)
+                        if reached is None:
+                            return None
+                    # The part that was reached joins the tree as a whole
+                    tree.add(reached)
+                    stack = [reached]
+                    while stack:
+                        for neighbor in neighbors[stack.pop()]:
+                            if colors[neighbor] == color and neighbor not in tree:
+                                tree.add(neighbor)
+                                stack.append(neighbor)
+        return [WHITE if color == FREE else color for color in colors]
+
+    def _extend(
+        self,
+        colors: list[int],
+        color: int,
+        tree: set[int],
+        neighbors: Sequence[Sequence[int]],
+    ) -> int | None:
+        """Color the shortest path of free tiles from a tree to another part
+
+        Returns:
+            The first tile of the part that was reached, None if none can be
+        """
+        # Tile every tile was found from, UNSEEN until it is found
+        came_from = [UNSEEN] * self.cells
+        for tile in tree:
+            came_from[tile] = tile
+        queue = deque(tree)
+        while queue:
+            tile = queue.popleft()
+            for neighbor in neighbors[tile]:
+                if came_from[neighbor] != UNSEEN:
+                    continue
+                came_from[neighbor] = tile
+                if colors[neighbor] == FREE:
+                    queue.append(neighbor)
+                elif colors[neighbor] == color:
+                    tile = came_from[neighbor]
+                    while tile not in tree:
+                        colors[tile] = color
+                        tree.add(tile)
+                        tile = came_from[tile]
+                    return neighbor
+        return None
+
+    def _search(
+        self, clues: Sequence[int], max_nodes: int, rng: random.Random
+    ) -> list[int]:
+        """One depth first search of solve, ties broken by rng
+
+        Raises:
+            TimeoutError: max_nodes ran out
+            ValueError: The board cannot be solved
+        """
+        colors = list(clues)
+        palette = sorted({clue for clue in clues if clue > WHITE})
+        rng.shuffle(palette)
+        banned: dict[int, set[int]] = {color: set() for color in palette}
+        neighbors = self._neighbors
+        # Tiles colored or banned so far, undone by walking back to a mark
+        trail: list[tuple[int, int | None]] = []
+        nodes = [0]
+
+        def undo(mark: int):
+            while len(trail) > mark:
+                tile, banned_color = trail.pop()
+                if banned_color is None:
+                    colors[tile] = FREE
+                else:
+                    banned[banned_color].discard(tile)
+
+        def search(focus: int | None) -> bool:
+            nodes[0] += 1
+            if nodes[0] > max_nodes:
+                raise TimeoutError
+            mark = len(trail)
+            while True:
+                # Keep growing the part that was grown last, so one connection is
+                # finished before the next is started, otherwise take the part
+                # with the fewest ways out over all unconnected colors
+                focused = best = None
+                forced = False
+                for color in palette:
+                    parts = self._parts(colors, color)
+                    if len(parts) < 2:
+                        continue
+                    required = self._required_tiles(colors, color, parts, banned[color])
+                    if required is None:
+                        undo(mark)
+                        return False
+                    if required:
+                        for tile in required:
+                            colors[tile] = color
+                            trail.append((tile, None))
+                        forced = True
+                        break
+                    for part in parts:
+                        exits = {
+                            neighbor
+                            for tile in part
+                            for neighbor in neighbors[tile]
+                            if colors[neighbor] == FREE
+                            and neighbor not in banned[color]
+                        }
+                        if focus is not None and focus in part:
+                            focused = (color, exits, part, parts)
+                        elif best is None or len(exits) < len(best[1]):
+                            best = (color, exits, part, parts)
+                if not forced:
+                    break
+            best = focused or best
+            if best is None:
+                return True
+
+            color, exits, part, parts = best
+            for tile in self._order_exits(
+                colors, exits, part, parts, banned[color], rng
+            ):
+                branch = len(trail)
+                colors[tile] = color
+                trail.append((tile, None))
+                if search(tile):
+                    return True
+                undo(branch)
+                banned[color].add(tile)
+                trail.append((tile, color))
+            undo(mark)
+            return False
+
+        if not search(None):
+            raise ValueError("Board cannot be solved")
+        return [WHITE if color == FREE else color for color in colors]
+
+    def _order_exits(
+        self,
+        colors: list[int],
+        exits: set[int],
+        part: list[int],
+        parts: list[list[int]],
+        banned: set[int],
+        rng: random.Random,
+    ) -> list[int]:
+        """Sort the ways out of a part, the closest to the other parts first
+
+        Distances are walked through the tiles the color may still use, so
+        exits towards a wall of other colors come last.
+        """
+        color = colors[part[0]]
+        neighbors = self._neighbors
+        distances = {tile: 0 for other in parts if other is not part for tile in other}
+        queue = deque(distances)
+        remaining = len(exits)
+        while queue and remaining:
+            tile = queue.popleft()
+            for neighbor in neighbors[tile]:
+                if neighbor in distances or neighbor in banned:
+                    continue
+                if colors[neighbor] == FREE or colors[neighbor] == color:
+                    distances[neighbor] = distances[tile] + 1
+                    queue.append(neighbor)
+                    remaining -= neighbor in exits
+        return sorted(
+            exits, key=lambda tile: (distances.get(tile, self.cells), rng.random())
+        )
+
+    def generate(
+        self, colors: int = 3, difficulty: float = 0.5, rng: random.Random | None = None
+    ) -> tuple[list[int], list[int]]:
+        """Make a board by laying out a solution first and locking tiles of it
+
+        Every color grows a random snaking region, the tiles of each region that
+        are farthest apart are locked, and some tiles outside the regions are
+        locked white. The regions are a solution, which is checked before
+        returning, so no search is needed.
+
+        Args:
+            colors: Amount of colors other than white
+            difficulty: From 0 to 1, higher locks more tiles per color farther
+                apart and blocks more of the board
+            rng: Random number generator, the random module if None
+
+        Returns:
+            The clues and the solution
+
+        Raises:
+            ValueError: The colors do not fit on the board, or no layout was
+                found in GENERATE_ATTEMPTS tries
+        """
+        rng = rng or random.Random()
+        neighbors = self._neighbors
+        # Every color needs at least two locked tiles of its own to connect
+        largest_region = self.cells // colors
+        if largest_region < TERMINALS[0]:
+            raise ValueError(
+                f"{colors} colors do not fit on a {self.size}x{self.size} board"
+            )
+        terminals = min(round(_lerp(TERMINALS, difficulty)), largest_region)
+        region_size = min(
+            max(terminals, int(self.cells * _lerp(COVERAGE, difficulty) / colors)),
+            largest_region,
+        )
+        for _ in range(GENERATE_ATTEMPTS):
+            solution = [WHITE] * self.cells
+            clues = [FREE] * self.cells
+            for color in range(1, colors + 1):
+                region = self._grow_region(solution, region_size, rng)
+                if len(region) < terminals:
+                    break
+                for tile in region:
+                    solution[tile] = color
+                for tile in self._spread_tiles(region, terminals, rng):
+                    clues[tile] = color
+            else:
+                unused = [tile for tile in range(self.cells) if solution[tile] == WHITE]
+                for tile in rng.sample(
+                    unused, int(len(unused) * _lerp(OBSTACLES, difficulty))
+                ):
+                    clues[tile] = WHITE
+                # Color no tiles that are not needed to connect the locked ones
+                self._trim(solution, clues, neighbors)
+                if is_solution(clues, solution, self.size):
+                    return clues, solution
+        raise ValueError(
+            f"Found no layout of {colors} colors on a {self.size}x{self.size} board"
+        )
+
+    def _grow_region(
+        self, solution: list[int], region_size: int, rng: random.Random
+    ) -> list[int]:
+        """Grow a connected region of white tiles, mostly from its newest tile
+
+        Returns:
+            The tiles of the region, none if no white tile is left
+        """
+        neighbors = self._neighbors
+        white_tiles = [tile for tile in range(self.cells) if solution[tile] == WHITE]
+        if not white_tiles:
+            return []
+        start = rng.choice(white_tiles)
+        region = [start]
+        taken = {start}
+        while len(region) < region_size:
+            # Growing from the newest tile makes long arms instead of blobs
+            tile = region[-1] if rng.random() < 0.8 else rng.choice(region)
+            options = [
+                neighbor
+                for neighbor in neighbors[tile]
+                if solution[neighbor] == WHITE and neighbor not in taken
+            ]
+            if not options:
+                options = [
+                    neighbor
+                    for tile in region
+                    for neighbor in neighbors[tile]
+                    if solution[neighbor] == WHITE and neighbor not in taken
+                ]
+                if not options:
+                    break
+            tile = rng.choice(options)
+            region.append(tile)
+            taken.add(tile)
+        return region
+
+    def _spread_tiles(
+        self, region: list[int], count: int, rng: random.Random
+    ) -> list[int]:
+        """Pick tiles of a region that are far apart along the region"""
+        members = set(region)
+        inside = {
+            tile: [
+                neighbor for neighbor in self._neighbors[tile] if neighbor in members
+            ]
+            for tile in region
+        }
+
+        def walk(start: int, nearest: dict[int, int]):
+            # Only tiles that get closer are walked on from, so every pick costs
+            # the tiles it is nearest to rather than the whole region
+            nearest[start] = 0
+            queue = deque([start])
+            while queue:
+                tile = queue.popleft()
+                distance = nearest[tile] + 1
+                for neighbor in inside[tile]:
+                    if nearest.get(neighbor, distance + 1) > distance:
+                        nearest[neighbor] = distance
+                        queue.append(neighbor)
+
+        from_random: dict[int, int] = {}
+        walk(rng.choice(region), from_random)
+        chosen = [max(region, key=from_random.__getitem__)]
+        nearest: dict[int, int] = {}
+        walk(chosen[0], nearest)
+        while len(chosen) < count:
+            tile = max(region, key=nearest.__getitem__)
+            chosen.append(tile)
+            walk(tile, nearest)
+        return chosen
+
+    def _trim(
+        self, solution: list[int], clues: list[int], neighbors: Sequence[Sequence[int]]
+    ):
+        """Whiten unlocked dead ends of the solution until there are none"""
+        stack = list(range(self.cells))
+        while stack:
+            tile = stack.pop()
+            color = solution[tile]
+            if color == WHITE or clues[tile] != FREE:
+                continue
+            same = [n for n in neighbors[tile] if solution[n] == color]
+            if len(same) <= 1:
+                solution[tile] = WHITE
+                stack.extend(same)
+
+
+@functools.lru_cache(maxsize=None)
+def get_solver(size: int) -> ConnectorSolver:
+    """Get the solver for a board size, building it on first use"""
+    return ConnectorSolver(size)
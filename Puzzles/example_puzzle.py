@@ -1,3 +1,5 @@
+import pathlib
+
 import PIL
 import pygame
 
@@ -14,7 +16,7 @@ class ExamplePuzzle(Puzzle):
 
     def __init__(
         self,
-        image: PIL.Image.Image,
+        image: PIL.Image.Image | str | pathlib.Path,
         pieces_per_side: int,
         output_size: tuple[int, int],
         puzzle_pos: tuple[int, int] = (0, 0),
@@ -1,6 +1,9 @@
+import pathlib
 import random
+from enum import Enum, auto
 
 import numpy as np
+import numpy.typing as npt
 import PIL
 import pygame
 
@@ -8,18 +11,55 @@ from helpers import EventHandler, EventTypes
 from puzzle import Puzzle
 
 
+class ScrambleModes(Enum):
+    """How the pieces of a FlippingPuzzle are turned"""
+
+    FLIP = auto()
+    ROTATE = auto()
+
+
 class FlippingPuzzle(Puzzle):
-    """Summary: breaks tiles into pieces and scrambles them by flipping them"""
+    """Summary: breaks tiles into pieces and scrambles them by flipping them
+
+    In ScrambleModes.ROTATE the pieces are rotated by 90 degrees per click
+    instead, or by 180 degrees if the pieces are not square.
+
+    Attributes:
+        orientations:
+            how many flips/turns every piece is away from its original orientation
+
+        wrong_pieces:
+            how many pieces do not look like they do in the original image
+    """
 
     def __init__(
         self,
-        image: PIL.Image.Image,
+        image: PIL.Image.Image | str | pathlib.Path,
         pieces_per_side: int,
         output_size: tuple[int, int],
         puzzle_pos: tuple[int, int] = (0, 0),
+        scramble_mode: ScrambleModes = ScrambleModes.FLIP,
     ):
         super().__init__(image, pieces_per_side, output_size, puzzle_pos)
-        self.old_image = self.image
+        self.scramble_mode = scramble_mode
+        if scramble_mode == ScrambleModes.FLIP:
+            self._orientation_count = 2
+        elif self.puzzle_scale[0] == self.puzzle_scale[1]:
+            self._orientation_count = 4
+        else:
+            self._orientation_count = 2
+        self.orientations = np.zeros(self.total_pieces, np.uint8)
+        # bit n is set if the piece looks the same as the original in orientation n,
+        # worked out once here so no click has to compare images
+        self._solved_orientations = np.zeros(self.total_pieces, np.uint8)
+        original_images = self.piece_images.reshape(-1, *self.piece_images.shape[2:])
+        for orientation in range(self._orientation_count):
+            looks_solved = np.all(
+                self.orient(original_images, orientation) == original_images,
+                axis=(1, 2, 3),
+            )
+            self._solved_orientations |= looks_solved.astype(np.uint8) << orientation
+        self.wrong_pieces = 0
         self.scramble()
         self.image_update()
 
@@ -27,30 +67,53 @@ class FlippingPuzzle(Puzzle):
         """Put your loop code here"""
         if event.type == pygame.MOUSEBUTTONUP:
             tile = self.get_tile_index_from_pos(pygame.mouse.get_pos())
+            if tile is None:
+                return
             self.flip(tile)
             self.image_update()
-            EventHandler.add(EventTypes.PUZZLE_SPRITE_UPDATE)
+            if self.is_solved():
+                EventHandler.add(EventTypes.PUZZLE_SOLVED)
 
     def scramble(self):
-        """Flips puzzle pieces randomly"""
-        for i in range(self.total_pieces):
-            rotations = random.randint(0, 1)
-            if rotations == 1:
-                self.flip(i)
+        """Flips puzzle pieces randomly, until at least one piece looks wrong"""
+        all_orientations = (1 << self._orientation_count) - 1
+        can_look_wrong = np.any(self._solved_orientations != all_orientations)
+        while True:
+            for i in range(self.total_pieces):
+                for _ in range(random.randrange(self._orientation_count)):
+                    self.flip(i)
+            if self.wrong_pieces or not can_look_wrong:
+                break
         self.image_update()
 
-    def flip(self, tile):
+    def orient(
+        self, images: npt.NDArray[np.uint8], orientation: int
+    ) -> npt.NDArray[np.uint8]:
+        """Returns a view of images, shape (..., y, x, channels), in an orientation"""
+        if self.scramble_mode == ScrambleModes.FLIP:
+            return images if orientation == 0 else np.flip(images, -2)
+        quarter_turns = orientation * (4 // self._orientation_count)
+        return np.rot90(images, quarter_turns, axes=(-3, -2))
+
+    def flip(self, tile: int):
         """Flips a clicked tile.
 
-        If tile is clicked it flips the piece and compares the updated image to
-        original to see if its correct
+        Turns the piece to its next orientation and keeps count of how many pieces
+        do not look like the original image, so checking is_solved is cheap
         """
-        self.pieces[tile].image = np.flip(self.pieces[tile].image, 1)
+        was_wrong = self._looks_wrong(tile)
+        self.orientations[tile] = (
+            self.orientations[tile] + 1
+        ) % self._orientation_count
+        self.pieces[tile].image = self.orient(
+            self.piece_images[divmod(tile, self.pieces_per_side)],
+            self.orientations[tile],
+        )
+        self.wrong_pieces += self._looks_wrong(tile) - was_wrong
 
-        self.image_update()
-        one = np.array(pygame.surfarray.array3d(self.image))
-        two = np.array(
-            PIL.Image.open("sample_images/Monalisa.png").resize(self.output_size)
-        ).swapaxes(0, 1)
-        if np.array_equal(one, two):
-            EventHandler.add(EventTypes.PUZZLE_SOLVED)
+    def is_solved(self) -> bool:
+        """Whether every piece looks like it does in the original image"""
+        return self.wrong_pieces == 0
+
+    def _looks_wrong(self, tile: int) -> bool:
+        return not self._solved_orientations[tile] >> self.orientations[tile] & 1
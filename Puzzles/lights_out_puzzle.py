@@ -1,3 +1,4 @@
+import pathlib
 import random
 
 import numpy as np
@@ -6,6 +7,9 @@ import pygame
 
 from helpers import EventHandler, EventTypes
 from puzzle import Puzzle
+from Puzzles.lights_out_solver import get_solver, toggle_masks
+
+SCRAMBLE_ATTEMPTS = 100
 
 
 class LightsOut(Puzzle):
@@ -14,18 +18,30 @@ class LightsOut(Puzzle):
 
     This is the Lights Out puzzle, where every piece you click on causes neighboring
     tiles to invert.
+
+    Attributes:
+        lights:
+            bitmask of the inverted tiles, tile i is bit i. The puzzle is solved
+            when it is 0
     """
 
     def __init__(
         self,
-        image: PIL.Image.Image,
+        image: PIL.Image.Image | str | pathlib.Path,
         pieces_per_side: int,
         output_size: tuple[int, int],
         puzzle_pos: tuple[int, int] = (0, 0),
+        min_moves: int | None = None,
     ):
         super().__init__(image, pieces_per_side, output_size, puzzle_pos)
-        self.light_list = [False] * self.total_pieces
-        self.scramble()
+        self.lights = 0
+        self._toggle_masks = toggle_masks(pieces_per_side)
+        self._solver = get_solver(pieces_per_side)
+        # Both looks of every piece are made once, inverting only swaps them
+        piece_shape = self.piece_images.shape[2:]
+        self._normal_images = self.piece_images.reshape(-1, *piece_shape)
+        self._inverted_images = np.negative(self._normal_images)
+        self.scramble(min_moves)
         self.generate_orderlist()
         self.image_update()
 
@@ -33,27 +49,31 @@ class LightsOut(Puzzle):
         """Put your loop code here"""
         if event.type == pygame.MOUSEBUTTONUP:
             tile = self.get_tile_index_from_pos(pygame.mouse.get_pos())
-            neighbors = self.get_neighbors(tile)
-            self.invert(neighbors)
+            if tile is None:
+                return
+            self.press(tile)
             self.image_update()
-            EventHandler.add(EventTypes.PUZZLE_SPRITE_UPDATE)
+            if self.is_solved():
+                EventHandler.add(EventTypes.PUZZLE_SOLVED)
+
+    def press(self, tile: int):
+        """Invert a tile and its neighbors"""
+        self.invert(self.get_neighbors(tile))
 
-    def invert(self, inverted_tiles: list[int]):
+    def invert(self, inverted_tiles: list[int] | int):
         """Invert the colors of any tile in the list"""
-        if not isinstance(inverted_tiles, int):
-            pass
-        else:
-            temp_list = []
-            temp_list.append(inverted_tiles)
-            inverted_tiles = temp_list.copy()
+        if isinstance(inverted_tiles, int):
+            inverted_tiles = [inverted_tiles]
         for i in inverted_tiles:
-            self.light_list[i] = False if self.light_list[i] else True
-            self.pieces[i].image = np.multiply(
-                self.pieces[i].image,
-                np.full(self.pieces[i].image.shape, fill_value=-1, dtype=np.uint8),
-            )
-        if self.light_list == [False] * self.total_pieces:
-            EventHandler.add(EventTypes.PUZZLE_SOLVED)
+            self.lights ^= 1 << i
+            if (self.lights >> i) & 1:
+                self.pieces[i].image = self._inverted_images[i]
+            else:
+                self.pieces[i].image = self._normal_images[i]
+
+    def is_solved(self) -> bool:
+        """Whether no tile is inverted"""
+        return self.lights == 0
 
     def get_neighbors(self, tile: int):
         """Find the neighbors of a given tile"""
@@ -68,8 +88,48 @@ class LightsOut(Puzzle):
             neighbors.append(tile + self.pieces_per_side)
         return neighbors
 
-    def scramble(self):
-        """Put the code to scramble your puzzle here"""
-        for _ in range(self.total_pieces):
-            self.invert(self.get_neighbors(random.randint(0, self.total_pieces - 1)))
+    def solve(self) -> list[int]:
+        """Get the tiles to click, in any order, to solve the puzzle from here"""
+        solution = self._solver.solve(self.lights)
+        # Boards only ever come from presses, so they can always be solved
+        assert solution is not None
+        return solution
+
+    def hint(self) -> int | None:
+        """Get a tile that is part of a solution, or None if already solved"""
+        solution = self.solve()
+        return solution[0] if solution else None
+
+    def scramble(self, min_moves: int | None = None):
+        """Scramble by pressing random tiles, which keeps the puzzle solvable
+
+        Args:
+            min_moves: Least amount of clicks the solution should take, as found by
+                the solver. If no such board turns up in SCRAMBLE_ATTEMPTS tries the
+                hardest one found is used. None presses total_pieces random tiles
+
+        Raises:
+            ValueError: min_moves is less than 1, which would leave it solved
+        """
+        if min_moves is not None and min_moves < 1:
+            raise ValueError(
+                f"A scrambled board takes at least 1 move, not {min_moves}"
+            )
+        best_board, best_length = 0, -1
+        for _ in range(SCRAMBLE_ATTEMPTS):
+            board = 0
+            if min_moves is None:
+                presses = random.choices(range(self.total_pieces), k=self.total_pieces)
+            else:
+                presses = random.sample(
+                    range(self.total_pieces), min(min_moves, self.total_pieces)
+                )
+            for tile in presses:
+                board ^= self._toggle_masks[tile]
+            solution_length = len(self._solver.solve(board) or ())
+            if board and solution_length > best_length:
+                best_board, best_length = board, solution_length
+            if best_length >= (min_moves or 1):
+                break
+        self.invert([i for i in range(self.total_pieces) if (best_board >> i) & 1])
         self.image_update()
@@ -0,0 +1,163 @@
+import functools
+
+# Solutions are only searched for the fewest presses if at most this many presses
+# can be toggled freely without changing the board, as every combination is tried
+MAX_NULL_SPACE_SEARCH = 12
+
+
+def toggle_masks(size: int) -> list[int]:
+    """Get the board bits every tile toggles on a size x size board
+
+    Tile r * size + c is bit r * size + c of a board.
+    """
+    masks = []
+    for tile in range(size * size):
+        row, column = divmod(tile, size)
+        mask = 1 << tile
+        if column != 0:
+            mask |= 1 << (tile - 1)
+        if column != size - 1:
+            mask |= 1 << (tile + 1)
+        if row != 0:
+            mask |= 1 << (tile - size)
+        if row != size - 1:
+            mask |= 1 << (tile + size)
+        masks.append(mask)
+    return masks
+
+
+def _parity(value: int) -> int:
+    return bin(value).count("1") & 1
+
+
+class LightsOutSolver:
+    """Solves Lights Out boards of one size by light chasing over GF(2)
+
+    Pressing the lights left on in a row from the row below turns the whole board
+    off except for the last row, which only depends on the presses in the first
+    row. That dependency is linear over GF(2), so it is worked out once per size
+    as a size x size system and every board only needs a row-parallel chase.
+
+    Args:
+        size: Tiles per side of the boards to solve
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._row_mask = (1 << size) - 1
+        # Column c holds the last row left by pressing only tile c of the first row
+        columns = [self._chase([0] * size, 1 << column)[1] for column in range(size)]
+        # Equation j: sum over c of columns[c] bit j times press c equals the bit j
+        # of the last row left by chasing with no first row presses
+        equations = [
+            sum(((columns[c] >> j) & 1) << c for c in range(size)) for j in range(size)
+        ]
+        # Reduced row echelon form, combos record which original equations were
+        # added together so right hand sides can be reduced the same way later
+        combos = [1 << j for j in range(size)]
+        pivot_variables = []
+        row = 0
+        for variable in range(size):
+            pivot = next(
+                (r for r in range(row, size) if (equations[r] >> variable) & 1), None
+            )
+            if pivot is None:
+                continue
+            equations[row], equations[pivot] = equations[pivot], equations[row]
+            combos[row], combos[pivot] = combos[pivot], combos[row]
+            for other in range(size):
+                if other != row and (equations[other] >> variable) & 1:
+                    equations[other] ^= equations[row]
+                    combos[other] ^= combos[row]
+            pivot_variables.append(variable)
+            row += 1
+        self._pivots = [
+            (variable, equations[index], combos[index])
+            for index, variable in enumerate(pivot_variables)
+        ]
+        self._consistency_combos = combos[row:]
+        self._null_space = []
+        for free in range(size):
+            if free in pivot_variables:
+                continue
+            vector = 1 << free
+            for variable, equation, _ in self._pivots:
+                if (equation >> free) & 1:
+                    vector |= 1 << variable
+            self._null_space.append(vector)
+
+    def _chase(self, rows: list[int], first_presses: int) -> tuple[list[int], int]:
+        """Press first_presses in the first row and chase the lights down
+
+        Returns:
+            The presses of every row and the lights left on in the last row
+        """
+        rows = rows.copy()
+        presses = []
+        row_presses = first_presses
+        for row in range(self.size):
+            presses.append(row_presses)
+            rows[row] ^= (
+                row_presses ^ (row_presses << 1) ^ (row_presses >> 1)
+            ) & self._row_mask
+            if row + 1 < self.size:
+                rows[row + 1] ^= row_presses
+            if row > 0:
+                rows[row - 1] ^= row_presses
+            row_presses = rows[row]
+        return presses, rows[-1]
+
+    def _rows(self, board: int) -> list[int]:
+        return [
+            (board >> (row * self.size)) & self._row_mask for row in range(self.size)
+        ]
+
+    def solve(self, board: int) -> list[int] | None:
+        """Get the tiles to press to turn every light off
+
+        Gives the fewest presses when few presses can be toggled freely, which is
+        the case for most sizes, otherwise just a valid solution.
+
+        Args:
+            board: Bitmask of the lights that are on
+
+        Returns:
+            The tiles to press, or None if the board cannot be solved
+        """
+        rows = self._rows(board)
+        _, residual = self._chase(rows, 0)
+        if any(_parity(combo & residual) for combo in self._consistency_combos):
+            return None
+        first_presses = 0
+        for variable, _, combo in self._pivots:
+            first_presses |= _parity(combo & residual) << variable
+
+        candidates = [first_presses]
+        if len(self._null_space) <= MAX_NULL_SPACE_SEARCH:
+            for combination in range(1, 1 << len(self._null_space)):
+                toggled = first_presses
+                for index, vector in enumerate(self._null_space):
+                    if (combination >> index) & 1:
+                        toggled ^= vector
+                candidates.append(toggled)
+        best_presses = min(
+            (self._chase(rows, candidate)[0] for candidate in candidates),
+            key=lambda presses: sum(bin(row).count("1") for row in presses),
+        )
+        return [
+            row * self.size + column
+            for row, row_presses in enumerate(best_presses)
+            for column in range(self.size)
+            if (row_presses >> column) & 1
+        ]
+
+    def is_solvable(self, board: int) -> bool:
+        """Whether every light on the board can be turned off"""
+        _, residual = self._chase(self._rows(board), 0)
+        return not any(_parity(combo & residual) for combo in self._consistency_combos)
+
+
+@functools.lru_cache(maxsize=None)
+def get_solver(size: int) -> LightsOutSolver:
+    """Get the solver for a board size, building it on first use"""
+    return LightsOutSolver(size)
@@ -1,5 +1,5 @@
+import pathlib
 import random
-import typing
 
 import numpy as np
 import PIL
@@ -7,10 +7,30 @@ import pygame
 
 from helpers import EventHandler, EventTypes
 from puzzle import Puzzle
+from Puzzles.sliding_solver import SlidingSolver, count_inversions, get_solver
+
+# Weights tried in order by hint(), each search giving up after HINT_MAX_NODES, so
+# a hint takes at most about a fifth of a second even when none is found
+HINT_WEIGHTS = (1, 2, 3, 5)
+HINT_MAX_NODES = 1000
+SCRAMBLE_MAX_NODES = 50000
+# Random walks board_with_optimal_length tries before settling for the closest board
+SCRAMBLE_ATTEMPTS = 200
+# Most moves any board of a size needs, not known for larger sizes
+DIAMETERS = {1: 0, 2: 6, 3: 31, 4: 80}
 
 
 class SlidingPuzzle(Puzzle):
-    """Container class for the Sliding Puzzle"""
+    """Container class for the Sliding Puzzle
+
+    Args:
+        target_moves: If given, scramble to a board whose shortest solution takes
+            exactly this many moves instead of shuffling
+
+    Attributes:
+        blank_index: orderlist index of the blank tile
+        correct_tiles: how many orderlist indices hold their own piece
+    """
 
     UP = (0, -1)
     DOWN = (0, 1)
@@ -20,21 +40,29 @@ class SlidingPuzzle(Puzzle):
 
     def __init__(
         self,
-        image: PIL.Image.Image,
+        image: PIL.Image.Image | str | pathlib.Path,
         pieces_per_side: int,
         output_size: tuple[int, int],
         puzzle_pos: tuple[int, int] = (0, 0),
+        target_moves: int | None = None,
     ):
         super().__init__(image, pieces_per_side, output_size, puzzle_pos)
-        self.scramble()
+        self.scramble(target_moves)
         self.image_update()
 
-    def scramble(self):
+    @property
+    def solver(self) -> SlidingSolver:
+        """The solver for this puzzle's size, only built when first needed"""
+        return get_solver(self.pieces_per_side)
+
+    def scramble(self, target_moves: int | None = None):
         """
         Summary
 
         Removes the last piece of puzzle, shuffles the puzzle, and then re-inserts
         the last puzzle piece.
+        If target_moves is given the blank is walked around randomly instead, until
+        the shortest solution takes exactly target_moves moves.
         """
         self.orderlist.pop()
         self.last_piece = self.pieces.pop()
@@ -42,20 +70,26 @@ class SlidingPuzzle(Puzzle):
         self.last_piece.image = np.full(
             self.pieces[0].image.shape, fill_value=0, dtype=np.uint8
         )
-        temp_list = self.orderlist.copy()
-        while temp_list == self.orderlist:
-            random.shuffle(self.orderlist)
-            if not self.solvable(self.orderlist):
-                self.orderlist[-1], self.orderlist[-2] = (
-                    self.orderlist[-2],
-                    self.orderlist[-1],
-                )
-        self.orderlist.append(self.total_pieces - 1)
+        if target_moves is None:
+            temp_list = self.orderlist.copy()
+            while temp_list == self.orderlist:
+                random.shuffle(self.orderlist)
+                if not self.solvable(self.orderlist):
+                    self.orderlist[-1], self.orderlist[-2] = (
+                        self.orderlist[-2],
+                        self.orderlist[-1],
+                    )
+            self.orderlist.append(self.total_pieces - 1)
+        else:
+            self.orderlist = self.board_with_optimal_length(target_moves)
         self.pieces.append(self.last_piece)
         for pos, i in enumerate(self.orderlist):
+            self.pieces[i].relative_index = pos
             self.pieces[i].relative_y, self.pieces[i].relative_x = divmod(
                 pos, self.pieces_per_side
             )
+        self.blank_index = self.orderlist.index(self.total_pieces - 1)
+        self.correct_tiles = sum(i == pos for pos, i in enumerate(self.orderlist))
 
     def loop(self, event: pygame.event.Event):
         """Loop to be run at every event to see how the puzzle should react"""
@@ -69,102 +103,139 @@ class SlidingPuzzle(Puzzle):
         """
         Summary
 
-        Takes a given tile index and detects if the last (blank) tile is in that row.
+        Takes a given tile index and detects if the last (blank) tile is in that row
+        or column, using the tracked blank_index.
         If it finds it, it returns the tiles that can move and the direction they can
         move in
         """
-        # Get tiles in row
-        orderlist_index_start = (
-            tile_index // self.pieces_per_side * self.pieces_per_side
-        )
-        orderlist_index_end = (
-            tile_index // self.pieces_per_side * self.pieces_per_side
-            + self.pieces_per_side
-        )
-        column_number = tile_index % self.pieces_per_side
-        orderlist_column = [
-            self.orderlist[column_number + i * self.pieces_per_side]
-            for i in range(self.pieces_per_side)
-        ]
-        orderlist_row = self.orderlist[orderlist_index_start:orderlist_index_end]
-        if self.total_pieces - 1 in orderlist_column:
-            zero_index = orderlist_column.index(self.total_pieces - 1)
-            tile_index_relative = tile_index // self.pieces_per_side
-            delta = zero_index - tile_index_relative
-            if delta == 0:
-                return SlidingPuzzle.NO_MOVE, [], tile_index
-            direction = SlidingPuzzle.UP if delta < 0 else SlidingPuzzle.DOWN
-            indices: typing.Sequence[int] = [
-                column_number + i * self.pieces_per_side
-                for i in range(self.pieces_per_side)
-            ]
-        elif self.total_pieces - 1 in orderlist_row:
-            zero_index = orderlist_row.index(self.total_pieces - 1)
-            tile_index_relative = tile_index % self.pieces_per_side
-            delta = zero_index - tile_index_relative
-            if delta == 0:
-                return SlidingPuzzle.NO_MOVE, [], tile_index
-            direction = SlidingPuzzle.LEFT if delta < 0 else SlidingPuzzle.RIGHT
-            indices = range(orderlist_index_start, orderlist_index_end)
-        else:
+        blank_row, blank_column = divmod(self.blank_index, self.pieces_per_side)
+        tile_row, tile_column = divmod(tile_index, self.pieces_per_side)
+        if tile_index == self.blank_index:
             return SlidingPuzzle.NO_MOVE, [], tile_index
-
-        movable = [
-            indices[i]
-            for i in range(
-                tile_index_relative, zero_index, [i for i in direction if i != 0][0]
+        if tile_column == blank_column:
+            direction = SlidingPuzzle.UP if blank_row < tile_row else SlidingPuzzle.DOWN
+            step = (
+                self.pieces_per_side if blank_row > tile_row else -self.pieces_per_side
             )
-        ]
-        return direction, movable, tile_index
+        elif tile_row == blank_row:
+            direction = (
+                SlidingPuzzle.LEFT
+                if blank_column < tile_column
+                else SlidingPuzzle.RIGHT
+            )
+            step = 1 if blank_column > tile_column else -1
+        else:
+            return SlidingPuzzle.NO_MOVE, [], tile_index
+        return direction, list(range(tile_index, self.blank_index, step)), tile_index
 
     def move(self, direction_tile_list_origin_tile: tuple[tuple[int, int], list, int]):
         """
         Summary
 
         Given the list of tiles, the move direction, and the originating tile,
-        this function changes the relative_x and relative_y of pieces to cause
-        puzzle shifts
+        this function slides the tiles one place towards the blank tile, which
+        ends up on the originating tile. Only the moved tiles are touched
         """
         direction, tile_list, origin_tile = direction_tile_list_origin_tile
         if direction == SlidingPuzzle.NO_MOVE:
             return 0
-        for i in tile_list:
-            self.pieces[self.orderlist[i]].relative_x += direction[0]
-            self.pieces[self.orderlist[i]].relative_y += direction[1]
-        self.generate_orderlist_given_tile(origin_tile)
-        if self.orderlist == list(range(self.total_pieces)):
+        blank = self.total_pieces - 1
+        changed_slots = [self.blank_index, *reversed(tile_list)]
+        # Walk from the blank to the clicked tile, pulling every tile into the gap
+        for slot, source in zip(changed_slots, changed_slots[1:] + [None]):
+            self.correct_tiles -= self.orderlist[slot] == slot
+            self.orderlist[slot] = blank if source is None else self.orderlist[source]
+            self.correct_tiles += self.orderlist[slot] == slot
+            piece = self.pieces[self.orderlist[slot]]
+            piece.relative_index = slot
+            piece.relative_y, piece.relative_x = divmod(slot, self.pieces_per_side)
+        self.blank_index = origin_tile
+        if self.is_solved():
             EventHandler.add(EventTypes.PUZZLE_SOLVED)
             self.pieces[-1].image = self.last_image
-        self.image_update()
+        self.image_update(changed_slots)
+
+    def is_solved(self) -> bool:
+        """Whether every tile is in its place"""
+        return self.correct_tiles == self.total_pieces
 
-    def generate_orderlist_given_tile(self, origin_tile: int):
+    def solvable(self, unsorted: list[int]):
         """
         Summary
 
-        Different generate_orderlist function that generates an orderlist
-        and moves the blank tile to the tile that the player clicked on
+        This function performs inversion counting on a list, in O(n log n).
+        If the number of inversions is even, then the puzzle is solvable
+        (assuming the blank tile is in the bottom right corner)
         """
-        for i in self.pieces:
-            if i.absolute_index == self.total_pieces - 1:
-                i.relative_y = origin_tile // self.pieces_per_side
-                i.relative_x = origin_tile % self.pieces_per_side
-                i.relative_index = origin_tile
-                continue
+        blank = self.total_pieces - 1
+        return count_inversions([i for i in unsorted if i != blank]) % 2 == 0
 
-            i.relative_index = i.relative_y * self.pieces_per_side + i.relative_x
-            self.orderlist[i.relative_index] = i.absolute_index
-        self.orderlist[origin_tile] = self.total_pieces - 1
+    def board_with_optimal_length(self, target_moves: int) -> list[int]:
+        """
+        Summary
 
-    def solvable(self, unsorted: list[int]):
+        Walks the blank tile around randomly from the solved board until a board
+        turns up whose shortest solution takes exactly target_moves moves.
+        Returns it as an orderlist. If none turns up in SCRAMBLE_ATTEMPTS walks,
+        the board found whose shortest solution came closest is returned.
+        Raises ValueError if no board needs target_moves moves, or if no board's
+        shortest solution could be found at all
+        """
+        diameter = DIAMETERS.get(self.pieces_per_side, float("inf"))
+        if not 0 <= target_moves <= diameter:
+            raise ValueError(
+                f"No {self.pieces_per_side}x{self.pieces_per_side} board takes "
+                f"{target_moves} moves to solve"
+            )
+        if target_moves == 0:
+            return list(range(self.total_pieces))
+        closest = None
+        closest_error = float("inf")
+        for _ in range(SCRAMBLE_ATTEMPTS):
+            board = list(range(self.total_pieces))
+            blank = previous = self.total_pieces - 1
+            for step in range(1, 3 * target_moves + 1):
+                options = [
+                    slot for slot in self.solver.neighbors(blank) if slot != previous
+                ]
+                slot = random.choice(options)
+                board[blank], board[slot] = board[slot], board[blank]
+                previous, blank = blank, slot
+                # Solution lengths always have the same parity as the walk's length
+                if step < target_moves or (step - target_moves) % 2:
+                    continue
+                length = self.solver.optimal_length(board, SCRAMBLE_MAX_NODES)
+                if length is None:
+                    break
+                if abs(length - target_moves) < closest_error:
+                    closest, closest_error = board.copy(), abs(length - target_moves)
+                if length == target_moves:
+                    return board
+                if length > target_moves:
+                    break
+        if closest is None:
+            raise ValueError(f"Found no board close to {target_moves} moves to solve")
+        return closest
+
+    def optimal_length(self) -> int | None:
         """
         Summary
 
-        This function performs inversion counting on a list.
-        If the number of inversions is even, then the puzzle is solvable
+        Returns the least amount of moves that solve the puzzle from here,
+        or None if finding it takes too long
+        """
+        return self.solver.optimal_length(self.orderlist, HINT_MAX_NODES)
+
+    def hint(self) -> int | None:
+        """
+        Summary
+
+        Returns the orderlist index of a tile to click next, or None if solved.
+        The tile is on a shortest solution if one is found quickly, otherwise
+        searches that allow longer solutions are tried.
         """
-        inversions = 0
-        for j in range(self.total_pieces - 1):
-            for i in range(j + 1, self.total_pieces - 1):
-                if unsorted[j] > unsorted[i]:
-                    inversions += 1
-        return inversions % 2 == 0
+        for weight in HINT_WEIGHTS:
+            solution = self.solver.solve(self.orderlist, HINT_MAX_NODES, weight)
+            if solution is not None:
+                return solution[0] if solution else None
+        return None
@@ -0,0 +1,424 @@
+import bisect
+import functools
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from helpers import CACHE_DIRECTORY
+
+# Pattern databases are indexed by every possible placement of their tiles, so the
+# amount of tiles per database is the most that keeps them below this many entries
+MAX_PATTERN_DATABASE_ENTRIES = 2**21
+# Groups of fewer tiles than this barely beat linear conflicts, so boards whose
+# groups would be smaller, 7x7 and up, go without pattern databases
+MIN_PATTERN_GROUP = 4
+UNVISITED = 255
+
+
+def count_inversions(values: Sequence[int]) -> int:
+    """Count the pairs of values that are out of order, in O(n log n)
+
+    Args:
+        values: Distinct non-negative integers
+    """
+    if not values:
+        return 0
+    # Fenwick tree over the values seen so far
+    tree = [0] * (max(values) + 2)
+    inversions = 0
+    for seen, value in enumerate(values):
+        index = value + 1
+        smaller_or_equal = 0
+        while index > 0:
+            smaller_or_equal += tree[index]
+            index -= index & -index
+        inversions += seen - smaller_or_equal
+        index = value + 1
+        while index < len(tree):
+            tree[index] += 1
+            index += index & -index
+    return inversions
+
+
+def is_solvable(board: Sequence[int], size: int) -> bool:
+    """Whether a board can be slid back to the solved order
+
+    Args:
+        board: Tile in every slot in row-major order, size * size - 1 is the blank
+        size: Tiles per side
+    """
+    blank = size * size - 1
+    inversions = count_inversions([tile for tile in board if tile != blank])
+    if size % 2 == 0:
+        # On even widths every vertical blank move also flips the parity
+        inversions += size - 1 - board.index(blank) // size
+    return inversions % 2 == 0
+
+
+def build_pattern_database(size: int, tiles: tuple[int, ...]) -> npt.NDArray[np.uint8]:
+    """Breadth first search the moves needed to put a group of tiles in place
+
+    Only moves of the group's tiles are counted and the blank may be anywhere, so
+    the sums over disjoint groups never overestimate the real amount of moves.
+
+    Args:
+        size: Tiles per side
+        tiles: Tiles of the group
+
+    Returns:
+        Moves indexed by sum(slot of tiles[i] * (size * size) ** i)
+    """
+    cells = size * size
+    weights = [cells**i for i in range(len(tiles))]
+    table = np.full(cells ** len(tiles), UNVISITED, np.uint8)
+    frontier = np.array([sum(tile * weight for tile, weight in zip(tiles, weights))])
+    table[frontier] = 0
+    depth = 0
+    while frontier.size:
+        depth += 1
+        slots = [(frontier // weight) % cells for weight in weights]
+        reached = []
+        for moving, slot in enumerate(slots):
+            row, column = np.divmod(slot, size)
+            for offset, can_move in (
+                (-size, row > 0),
+                (size, row < size - 1),
+                (-1, column > 0),
+                (1, column < size - 1),
+            ):
+                target = slot + offset
+                for other, other_slot in enumerate(slots):
+                    if other != moving:
+                        can_move &= other_slot != target
+                reached.append(frontier[can_move] + offset * weights[moving])
+        frontier = np.unique(np.concatenate(reached))
+        frontier = frontier[table[frontier] == UNVISITED]
+        table[frontier] = depth
+    return table
+
+
+def load_pattern_database(size: int, tiles: tuple[int, ...]) -> npt.NDArray[np.uint8]:
+    """Get a pattern database from the disk cache, building and caching it if needed"""
+    path = CACHE_DIRECTORY / f"sliding_{size}_{'-'.join(map(str, tiles))}.npy"
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+    table = build_pattern_database(size, tiles)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, table)
+    except OSError:
+        pass
+    return table
+
+
+def _line_conflicts(goals: list[int]) -> int:
+    """Tiles that have to leave a line so the rest can pass each other
+
+    Args:
+        goals: Goal positions along the line of the tiles whose goal is in the line,
+            in their current order
+    """
+    # Longest increasing subsequence, the tiles in it never have to leave
+    longest: list[int] = []
+    for goal in goals:
+        index = bisect.bisect_right(longest, goal)
+        if index == len(longest):
+            longest.append(goal)
+        else:
+            longest[index] = goal
+    return len(goals) - len(longest)
+
+
+class SlidingSolver:
+    """Finds shortest solutions of sliding puzzles with IDA*
+
+    The heuristic is the larger of Manhattan distance plus linear conflicts and
+    the sum of additive pattern databases, which are built once per size and
+    cached on disk, for boards small enough to group MIN_PATTERN_GROUP tiles.
+    Boards are sequences of the tile in every slot in row-major order, with
+    size * size - 1 as the blank, like SlidingPuzzle.orderlist. Searches keep
+    their own stack, so solutions of any length fit.
+
+    Args:
+        size: Tiles per side
+        use_pattern_databases: Whether to build/load the pattern databases
+    """
+
+    def __init__(self, size: int, use_pattern_databases: bool = True):
+        self.size = size
+        self.cells = size * size
+        self.blank = self.cells - 1
+        self._neighbors = [
+            [
+                slot + offset
+                for offset, valid in (
+                    (-size, slot >= size),
+                    (size, slot < self.cells - size),
+                    (-1, slot % size != 0),
+                    (1, slot % size != size - 1),
+                )
+                if valid
+            ]
+            for slot in range(self.cells)
+        ]
+        # Manhattan distance of every tile from every slot, 0 for the blank
+        self._distances = [
+            [
+                0
+                if tile == self.blank
+                else abs(tile // size - slot // size) + abs(tile % size - slot % size)
+                for slot in range(self.cells)
+            ]
+            for tile in range(self.cells)
+        ]
+        self._databases: list[npt.NDArray[np.uint8]] = []
+        self._tile_database: dict[int, tuple[int, int]] = {}
+        group_size = 1
+        while self.cells ** (group_size + 1) <= MAX_PATTERN_DATABASE_ENTRIES:
+            group_size += 1
+        if use_pattern_databases and size > 1 and group_size >= MIN_PATTERN_GROUP:
+            for start in range(0, self.blank, group_size):
+                tiles = tuple(range(start, min(start + group_size, self.blank)))
+                for digit, tile in enumerate(tiles):
+                    self._tile_database[tile] = (
+                        len(self._databases),
+                        self.cells**digit,
+                    )
+                self._databases.append(load_pattern_database(size, tiles))
+
+    def neighbors(self, slot: int) -> list[int]:
+        """Get the slots next to a slot"""
+        return self._neighbors[slot]
+
+    def _row_conflicts(self, board: list[int], row: int) -> int:
+        slots = range(row * self.size, (row + 1) * self.size)
+        return _line_conflicts(
+            [
+                board[slot] % self.size
+                for slot in slots
+                if board[slot] != self.blank and board[slot] // self.size == row
+            ]
+        )
+
+    def _column_conflicts(self, board: list[int], column: int) -> int:
+        slots = range(column, self.cells, self.size)
+        return _line_conflicts(
+            [
+                board[slot] // self.size
+                for slot in slots
+                if board[slot] != self.blank and board[slot] % self.size == column
+            ]
+        )
+
+    def solve(
+        self, board: Sequence[int], max_nodes: int | None = None, weight: float = 1
+    ) -> list[int] | None:
+        """Find a shortest solution
+
+        Args:
+            board: Tile in every slot
+            max_nodes: Give up after expanding this many positions, None to never
+            weight: Multiplier for the heuristic, over 1 finds solutions a lot faster
+                but they are no longer guaranteed to be the shortest
+
+        Returns:
+            Slots of the tiles to slide into the blank, in order, or None if
+            max_nodes ran out
+
+        Raises:
+            ValueError: The board cannot be solved
+        """
+        if not is_solvable(board, self.size):
+            raise ValueError("Board cannot be solved")
+        board = list(board)
+        blank_tile = self.blank
+        size = self.size
+        neighbors = self._neighbors
+        distances = self._distances
+        databases = self._databases
+        tile_database = self._tile_database
+        row_conflicts = [self._row_conflicts(board, row) for row in range(size)]
+        column_conflicts = [
+            self._column_conflicts(board, column) for column in range(size)
+        ]
+        indices = [0] * len(databases)
+        for slot, tile in enumerate(board):
+            if tile in tile_database:
+                database, digit_weight = tile_database[tile]
+                indices[database] += slot * digit_weight
+        path: list[int] = []
+        nodes = 0
+
+        def move(blank: int, slot: int, conflicts: int, database_estimate: int):
+            """Slide the tile in slot into the blank, returning how to undo it"""
+            tile = board[slot]
+            board[blank] = tile
+            board[slot] = blank_tile
+            # Only the line the tile moves across can gain or lose conflicts, and
+            # only if it is the tile's goal line
+            if slot % size == blank % size:
+                line, line_conflicts, line_function = (
+                    tile // size,
+                    row_conflicts,
+                    self._row_conflicts,
+                )
+                moved = line in (slot // size, blank // size)
+            else:
+                line, line_conflicts, line_function = (
+                    tile % size,
+                    column_conflicts,
+                    self._column_conflicts,
+                )
+                moved = line in (slot % size, blank % size)
+            old_line = line_conflicts[line]
+            if moved:
+                line_conflicts[line] = line_function(board, line)
+                conflicts += 2 * (line_conflicts[line] - old_line)
+            database = old_index = -1
+            if tile in tile_database:
+                database, digit_weight = tile_database[tile]
+                table = databases[database]
+                old_index = indices[database]
+                indices[database] += (blank - slot) * digit_weight
+                database_estimate += int(table[indices[database]]) - int(
+                    table[old_index]
+                )
+            undo = (
+                blank,
+                slot,
+                tile,
+                line_conflicts,
+                line,
+                old_line,
+                database,
+                old_index,
+            )
+            return conflicts, database_estimate, undo
+
+        def undo_move(undo: tuple):
+            (
+                blank,
+                slot,
+                tile,
+                line_conflicts,
+                line,
+                old_line,
+                database,
+                old_index,
+            ) = undo
+            board[blank] = blank_tile
+            board[slot] = tile
+            line_conflicts[line] = old_line
+            if database != -1:
+                indices[database] = old_index
+
+        def search(bound: float) -> float:
+            """Returns -1 when solved, otherwise the smallest cost over bound
+
+            Depth first with an explicit stack, so long solutions of big boards
+            do not run into the recursion limit. Every frame holds a position
+            on the path, the moves left to try from it and how to undo the move
+            that led to it.
+            """
+            nonlocal nodes
+            if distance == 0:
+                return -1
+            smallest = float("inf")
+            start = board.index(blank_tile)
+            stack = [
+                (
+                    start,
+                    -1,
+                    distance,
+                    conflicts,
+                    database_estimate,
+                    iter(neighbors[start]),
+                    None,
+                )
+            ]
+            while stack:
+                (
+                    blank,
+                    previous,
+                    frame_distance,
+                    frame_conflicts,
+                    frame_database,
+                ) = stack[-1][:5]
+                cost = len(stack)
+                for slot in stack[-1][5]:
+                    if slot == previous:
+                        continue
+                    tile = board[slot]
+                    new_distance = (
+                        frame_distance + distances[tile][blank] - distances[tile][slot]
+                    )
+                    new_conflicts, new_database, undo = move(
+                        blank, slot, frame_conflicts, frame_database
+                    )
+                    estimate = max(new_distance + new_conflicts, new_database)
+                    if cost + estimate * weight > bound:
+                        smallest = min(smallest, cost + estimate * weight)
+                        undo_move(undo)
+                        continue
+                    path.append(slot)
+                    if new_distance == 0:
+                        return -1
+                    nodes += 1
+                    if max_nodes is not None and nodes > max_nodes:
+                        raise TimeoutError
+                    stack.append(
+                        (
+                            slot,
+                            blank,
+                            new_distance,
+                            new_conflicts,
+                            new_database,
+                            iter(neighbors[slot]),
+                            undo,
+                        )
+                    )
+                    break
+                else:
+                    undo = stack.pop()[6]
+                    if undo is not None:
+                        undo_move(undo)
+                        path.pop()
+            return smallest
+
+        distance = sum(distances[tile][slot] for slot, tile in enumerate(board))
+        conflicts = 2 * (sum(row_conflicts) + sum(column_conflicts))
+        database_estimate = sum(int(db[i]) for db, i in zip(databases, indices))
+        bound = max(distance + conflicts, database_estimate) * weight
+        try:
+            while True:
+                result = search(bound)
+                if result == -1:
+                    return path
+                bound = result
+        except TimeoutError:
+            return None
+
+    def optimal_length(
+        self, board: Sequence[int], max_nodes: int | None = None
+    ) -> int | None:
+        """Get the least amount of moves to solve a board, see solve"""
+        solution = self.solve(board, max_nodes)
+        return None if solution is None else len(solution)
+
+    def hint(self, board: Sequence[int], max_nodes: int | None = None) -> int | None:
+        """Get the slot of the tile to slide first on a shortest solution
+
+        Returns:
+            The slot, or None if the board is solved or max_nodes ran out
+        """
+        solution = self.solve(board, max_nodes)
+        return solution[0] if solution else None
+
+
+@functools.lru_cache(maxsize=None)
+def get_solver(size: int) -> SlidingSolver:
+    """Get the solver for a board size, building it on first use"""
+    return SlidingSolver(size)
@@ -0,0 +1,374 @@
+import collections
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import threading
+from typing import Any, Hashable, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import PIL.Image
+
+from helpers import CACHE_DIRECTORY
+
+# Relative asset paths are looked up from the directory of the game, not the cwd
+ASSET_DIRECTORY = pathlib.Path(__file__).parent
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+# Images decoded ahead of time by build_pack, so startup only has to map them
+PACK_PATH = ASSET_DIRECTORY / "assets.pack"
+PACKED_ASSETS = (
+    "GameMap/floor_surface.png",
+    "GameMap/deco_surface.png",
+    "Player/collision_map.png",
+    "Player/player_up.png",
+    "Player/player_down.png",
+    "Player/player_left.png",
+    "Player/player_right.png",
+)
+PACK_MAGIC = b"PICKLEDPEPS-PACK-1\n"
+# Arrays in a pack start at multiples of this many bytes
+PACK_ALIGNMENT = 64
+# Levels of an image pyramid halve in size until a side would get below this
+PYRAMID_MIN_SIZE = 64
+
+
+def _align(offset: int) -> int:
+    return -(-offset // PACK_ALIGNMENT) * PACK_ALIGNMENT
+
+
+def _source_stamp(path: pathlib.Path) -> list[int]:
+    """What tells a changed source image apart, its modification time and size"""
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_pack(
+    names: Sequence[str] = PACKED_ASSETS,
+    path: pathlib.Path = PACK_PATH,
+    root: pathlib.Path = ASSET_DIRECTORY,
+) -> int:
+    """Decode images into one uncompressed file that AssetPack can map
+
+    The file is PACK_MAGIC, the length of a JSON index as 8 little endian
+    bytes, the index, and then the raw pixels of every image. The index holds
+    the offset from the start of the pixels, shape and source stamp of every
+    image, by its path relative to root.
+
+    Returns:
+        The size of the pack in bytes
+    """
+    index = {}
+    arrays = []
+    offset = 0
+    for name in names:
+        source = root / name
+        with PIL.Image.open(source) as image:
+            array = np.ascontiguousarray(np.array(image), dtype=np.uint8)
+        index[name] = {
+            "offset": offset,
+            "shape": list(array.shape),
+            "source": _source_stamp(source),
+        }
+        arrays.append(array)
+        offset = _align(offset + array.nbytes)
+    header = json.dumps(index).encode()
+    data_start = _align(len(PACK_MAGIC) + 8 + len(header))
+    temporary = path.with_suffix(".tmp")
+    with temporary.open("wb") as file:
+        file.write(PACK_MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, array in zip(names, arrays):
+            file.seek(data_start + index[name]["offset"])
+            file.write(array.tobytes())
+        size = file.tell()
+    # Replacing in one step means a running game never sees half a pack
+    os.replace(temporary, path)
+    return size
+
+
+class AssetPack:
+    """Images from a pack made by build_pack, mapped into memory instead of read
+
+    Args:
+        path: Path of the pack
+        root: Directory the paths in the pack are relative to
+
+    Raises:
+        OSError: The pack cannot be read
+        ValueError: The file is not a pack
+    """
+
+    def __init__(
+        self, path: pathlib.Path = PACK_PATH, root: pathlib.Path = ASSET_DIRECTORY
+    ):
+        self.root = pathlib.Path(root)
+        with open(path, "rb") as file:
+            if file.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                raise ValueError(f"{path} is not an asset pack")
+            header_size = int.from_bytes(file.read(8), "little")
+            self._index: dict[str, dict[str, Any]] = json.loads(file.read(header_size))
+        self._data_start = _align(len(PACK_MAGIC) + 8 + header_size)
+        self._pixels = np.memmap(path, np.uint8, "r")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def is_stale(self, name: str) -> bool:
+        """Whether the source image changed after the pack was built"""
+        try:
+            return _source_stamp(self.root / name) != self._index[name]["source"]
+        except OSError:
+            return True
+
+    def array(self, name: str) -> npt.NDArray[np.uint8] | None:
+        """Get an image as a read only array backed by the pack
+
+        Returns:
+            The array, or None if the image is not in the pack or is stale
+        """
+        if name not in self._index or self.is_stale(name):
+            return None
+        entry = self._index[name]
+        start = self._data_start + entry["offset"]
+        size = int(np.prod(entry["shape"]))
+        return self._pixels[start : start + size].reshape(entry["shape"])
+
+
+def _is_mapped(array: np.ndarray) -> bool:
+    """Whether an array is backed by a file mapped into memory"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def _size_in_bytes(asset: Any) -> int:
+    """Bytes of memory an asset owns
+
+    Arrays mapped from a file count as nothing, their pages belong to the
+    operating system, which can drop them again whenever it needs the memory.
+    """
+    if isinstance(asset, list):
+        return sum(_size_in_bytes(item) for item in asset)
+    if isinstance(asset, np.ndarray):
+        return 0 if _is_mapped(asset) else asset.nbytes
+    return asset.width * asset.height * len(asset.getbands())
+
+
+class AssetCache:
+    """Loads images once and keeps them, and what is made from them, around
+
+    Decoded images and arrays are kept in one least recently used cache. Once
+    they take up more than memory_budget bytes the ones used longest ago are
+    dropped, to be loaded again when next needed. The cache can be used from
+    several threads.
+
+    Cached assets are shared, so they must not be changed: arrays are read
+    only, and PIL images should be copied before drawing on them.
+
+    Arrays of images in an up to date asset pack are mapped from it instead of
+    decoded, images missing from it or changed since it was built are decoded
+    as usual. Mapped arrays do not count towards memory_budget, as the memory
+    they take up is not owned by the cache.
+
+    Args:
+        root: Directory relative paths are resolved from
+        memory_budget: Bytes the cached assets may take up
+        pack_path: Asset pack to map arrays from, None to always decode
+
+    Attributes:
+        memory_budget: Bytes the cached assets may take up
+        loads: How many times an image file was decoded
+    """
+
+    def __init__(
+        self,
+        root: pathlib.Path = ASSET_DIRECTORY,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        pack_path: pathlib.Path | None = PACK_PATH,
+    ):
+        self.root = pathlib.Path(root)
+        self.pack_path = pack_path
+        self._pack: AssetPack | None = None
+        self._pack_opened = False
+        self.memory_budget = memory_budget
+        self.loads = 0
+        self._entries: collections.OrderedDict[
+            Hashable, tuple[Any, int]
+        ] = collections.OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.RLock()
+
+    @property
+    def memory_used(self) -> int:
+        """Bytes the cached assets take up"""
+        return self._memory_used
+
+    def path(self, name: str | pathlib.Path) -> pathlib.Path:
+        """Resolve an asset path, relative paths are relative to root"""
+        return (self.root / name).resolve()
+
+    def image(self, name: str | pathlib.Path) -> PIL.Image.Image:
+        """Get a decoded image"""
+        path = self.path(name)
+
+        def load():
+            with self._lock:
+                self.loads += 1
+            with PIL.Image.open(path) as image:
+                image.load()
+                return image
+
+        return self._get(("image", path), load)
+
+    def array(self, name: str | pathlib.Path) -> npt.NDArray[np.uint8]:
+        """Get the pixels of an image as a read only (y, x, channels) array"""
+        path = self.path(name)
+
+        def load():
+            packed = self._packed_array(path)
+            if packed is not None:
+                return packed
+            array = np.array(self.image(path))
+            array.flags.writeable = False
+            return array
+
+        return self._get(("array", path), load)
+
+    def pyramid(self, name: str | pathlib.Path) -> list[PIL.Image.Image]:
+        """Get an RGB image and versions of it halved in size again and again
+
+        The first level is the full image, every next level is half as wide
+        and high as the one before, down to PYRAMID_MIN_SIZE.
+        """
+        path = self.path(name)
+
+        def load():
+            levels = [self.image(path).convert("RGB")]
+            while min(levels[-1].size) >= 2 * PYRAMID_MIN_SIZE:
+                levels.append(levels[-1].reduce(2))
+            return levels
+
+        return self._get(("pyramid", path), load)
+
+    def pieces(
+        self,
+        name: str | pathlib.Path,
+        size: tuple[int, int],
+        pieces_per_side: int,
+        resample: PIL.Image.Resampling = PIL.Image.Resampling.BICUBIC,
+    ) -> npt.NDArray[np.uint8]:
+        """Get an RGB image resized and cut into pieces_per_side² pieces
+
+        The image is shrunk below size until it divides into the pieces
+        without remainder, and resized from the smallest pyramid level that is
+        at least that big. The pieces are kept on disk as well, so resizing is
+        only done once for every image, size and amount of pieces.
+
+        Args:
+            name: Path of the image
+            size: Size to resize the image to, as (width, height)
+            pieces_per_side: How many pieces the image is cut into along a side
+            resample: PIL filter to resize with
+
+        Returns:
+            Read only array of shape (rows, cols, piece height, piece width, 3)
+        """
+        path = self.path(name)
+        width = size[0] - size[0] % pieces_per_side
+        height = size[1] - size[1] % pieces_per_side
+
+        def load():
+            # The source stamp makes a changed image miss the old pieces
+            key = f"{path}|{_source_stamp(path)}|{width}x{height}|{pieces_per_side}"
+            digest = hashlib.sha1(f"{key}|{resample.name}".encode()).hexdigest()
+            cache_path = CACHE_DIRECTORY / f"pieces_{digest[:20]}.npy"
+            try:
+                return np.load(cache_path, mmap_mode="r")
+            except (OSError, ValueError):
+                pass
+            levels = self.pyramid(path)
+            source = next(
+                (
+                    level
+                    for level in reversed(levels)
+                    if level.width >= width and level.height >= height
+                ),
+                levels[0],
+            )
+            board = np.array(source.resize((width, height), resample))
+            pieces = np.ascontiguousarray(
+                board.reshape(
+                    pieces_per_side,
+                    height // pieces_per_side,
+                    pieces_per_side,
+                    width // pieces_per_side,
+                    board.shape[2],
+                ).swapaxes(1, 2)
+            )
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                np.save(cache_path, pieces)
+            except OSError:
+                pass
+            pieces.flags.writeable = False
+            return pieces
+
+        return self._get(
+            ("pieces", path, width, height, pieces_per_side, resample), load
+        )
+
+    def _packed_array(self, path: pathlib.Path) -> npt.NDArray[np.uint8] | None:
+        with self._lock:
+            if not self._pack_opened:
+                if self.pack_path is not None:
+                    try:
+                        self._pack = AssetPack(self.pack_path, self.root)
+                    except (OSError, ValueError):
+                        self._pack = None
+                self._pack_opened = True
+        if self._pack is None:
+            return None
+        try:
+            name = path.relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return None
+        return self._pack.array(name)
+
+    def clear(self):
+        """Drop every cached asset"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_used = 0
+
+    def _get(self, key: Hashable, load) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        # Loading without the lock lets other threads use the cache meanwhile,
+        # if two threads load the same asset the one done first is kept
+        asset = load()
+        size = _size_in_bytes(asset)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self._entries[key] = (asset, size)
+            self._memory_used += size
+            # Never drop the asset that was just loaded, even if it is too big
+            while self._memory_used > self.memory_budget and len(self._entries) > 1:
+                _, (_, dropped_size) = self._entries.popitem(last=False)
+                self._memory_used -= dropped_size
+            return asset
+
+
+# The cache every module loads its images through
+asset_cache = AssetCache()
+
+
+if __name__ == "__main__":
+    pack_size = build_pack()
+    print(f"Packed {len(PACKED_ASSETS)} images into {PACK_PATH} ({pack_size} bytes)")
@@ -0,0 +1,110 @@
+"""Compare loading the map and player assets from the PNGs and from the pack
+
+Run from the repository root with `python -m benchmarks.cold_start`. Every
+sample runs in a new interpreter, so nothing is cached in the process. The pack
+is built first if it is missing or stale, the file cache of the OS is warm for
+both, so this measures decoding and not the disk.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SAMPLES = 10
+
+
+def load(use_pack: bool) -> dict[str, float]:
+    """Load the assets in this process and get the seconds each step took"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import numpy as np
+    import pygame
+
+    from assets import PACK_PATH, PACKED_ASSETS, AssetCache
+
+    pygame.init()
+    cache = AssetCache(pack_path=PACK_PATH if use_pack else None)
+    start = time.perf_counter()
+    for name in PACKED_ASSETS:
+        # Touch every pixel, a mapped array is only read once it is used
+        int(cache.array(name).sum(dtype=np.uint64))
+    arrays = time.perf_counter() - start
+    cache.clear()
+
+    import assets
+
+    # GameMap and Player take asset_cache from the module when they are imported
+    assets.asset_cache = cache
+    from GameMap.game_map import GameMap
+    from Player.player import Player
+
+    start = time.perf_counter()
+    GameMap(
+        "GameMap/floor_surface.png",
+        "GameMap/deco_surface.png",
+        np.array((16, 12)),
+        np.array((16, 16)),
+        4,
+        np.array((2, 10)),
+    )
+    Player(4, (10, 19))
+    objects = time.perf_counter() - start
+    return {"arrays": arrays, "map and player": objects, "decodes": cache.loads}
+
+
+def sample(use_pack: bool) -> dict[str, float]:
+    """Run load in a new interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child"]
+        + (["--pack"] if use_pack else []),
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main() -> int:
+    """Build the pack if needed and print the median of every step"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--pack", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(load(args.pack)))
+        return 0
+
+    from assets import PACK_PATH, PACKED_ASSETS, AssetPack, build_pack
+
+    try:
+        pack = AssetPack(PACK_PATH)
+        stale = any(name not in pack or pack.is_stale(name) for name in PACKED_ASSETS)
+    except (OSError, ValueError):
+        stale = True
+    if stale:
+        build_pack()
+
+    print(f"{'step':<20}{'png':>12}{'pack':>12}{'speedup':>10}")
+    results = {
+        label: [sample(use_pack) for _ in range(args.samples)]
+        for label, use_pack in (("png", False), ("pack", True))
+    }
+    for step in ("arrays", "map and player"):
+        png, pack_time = (
+            statistics.median(run[step] for run in results[label])
+            for label in ("png", "pack")
+        )
+        print(
+            f"{step:<20}{png * 1000:>10.2f}ms{pack_time * 1000:>10.2f}ms"
+            f"{png / pack_time:>9.1f}x"
+        )
+    print(f"{'images decoded':<20}{results['png'][0]['decodes']:>12}", end="")
+    print(f"{results['pack'][0]['decodes']:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
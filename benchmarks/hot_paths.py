@@ -0,0 +1,307 @@
+"""Time the map, player and puzzle hot paths and compare them to a baseline
+
+Run from the repository root with `python -m benchmarks.hot_paths`. `--save`
+stores the results as a JSON baseline, `--compare` exits with status 1 if any
+case got slower than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import random
+import sys
+import timeit
+from typing import Callable, Iterator
+
+import numpy as np
+import pygame
+
+from assets import asset_cache
+from GameMap.game_map import GameMap
+from GameMap.tile_map import ChunkedGameMap, TileMap
+from helpers import EventHandler, make_2d_surface_from_array
+from Player.player import Player
+from puzzle import Puzzle
+from Puzzles.connector_puzzle import Connector
+from Puzzles.connector_solver import ConnectorSolver
+from Puzzles.flipping_puzzle import FlippingPuzzle
+from Puzzles.lights_out_puzzle import LightsOut
+from Puzzles.sliding_puzzle import SlidingPuzzle
+
+BASELINE_PATH = pathlib.Path(__file__).parent / "baseline.json"
+BOARD_SIZES = (4, 8, 16, 32, 64)
+# Board sizes and difficulties puzzle packs are generated at
+GENERATOR_SIZES = (8, 12, 16)
+GENERATOR_DIFFICULTIES = (0.0, 0.5, 1.0)
+SCALING_FACTORS = (1, 2, 4)
+SCREEN_SIZE = np.array((1024, 768))
+TILE_PIXEL_SIZE = np.array((16, 12))
+PUZZLE_SIZE = (512, 512)
+# Every case is timed REPEATS times for at least MIN_TIME seconds, keeping the
+# fastest, which is the one least disturbed by the rest of the machine
+REPEATS = 5
+MIN_TIME = 0.05
+TOLERANCE = 0.5
+
+Case = tuple[str, Callable[[], object]]
+
+
+def time_per_call(function: Callable[[], object]) -> float:
+    """Get the seconds a call takes in steady state"""
+    function()
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 2
+    return min(timer.repeat(REPEATS, number)) / number
+
+
+def drained(function: Callable[[], object]) -> Callable[[], object]:
+    """Clear the events a call adds, as the main loop would"""
+
+    def call():
+        function()
+        EventHandler.get()
+
+    return call
+
+
+def map_cases() -> Iterator[Case]:
+    """GameMap.update while walking and while pushed against the padding"""
+    tile_map = TileMap.from_images(
+        {
+            "floor": asset_cache.array("GameMap/floor_surface.png"),
+            "deco": asset_cache.array("GameMap/deco_surface.png"),
+        },
+        TILE_PIXEL_SIZE,
+    )
+    for scaling_factor in SCALING_FACTORS:
+        tiles_on_screen = np.ceil(
+            SCREEN_SIZE / (TILE_PIXEL_SIZE * scaling_factor)
+        ).astype(int)
+        game_map = GameMap(
+            "GameMap/floor_surface.png",
+            "GameMap/deco_surface.png",
+            TILE_PIXEL_SIZE,
+            tiles_on_screen,
+            scaling_factor,
+            np.array((2, 10)),
+        )
+        directions = [(1, 0), (-1, 0)]
+
+        def walk(game_map=game_map, directions=directions):
+            directions.reverse()
+            game_map.update(directions[0])
+
+        yield f"GameMap.update in bounds x{scaling_factor}", walk
+        game_map.update((-1000, -1000))
+        yield f"GameMap.update at edge x{scaling_factor}", (
+            lambda game_map=game_map: game_map.update((-1, 0))
+        )
+        chunked_map = ChunkedGameMap(
+            tile_map, tiles_on_screen, scaling_factor, np.array((2, 10)), stream=False
+        )
+        yield f"ChunkedGameMap.update in bounds x{scaling_factor}", (
+            lambda game_map=chunked_map, directions=[(1, 0), (-1, 0)]: walk(
+                game_map, directions
+            )
+        )
+
+
+def surface_cases() -> Iterator[Case]:
+    """make_2d_surface_from_array for a sprite and for a whole map layer"""
+    rng = np.random.default_rng(0)
+    layer_shape = asset_cache.array("GameMap/floor_surface.png").shape
+    for name, shape in (("sprite", (12, 16, 3)), ("map layer", layer_shape)):
+        array = rng.integers(0, 256, shape, dtype=np.uint8)
+        for scaling_factor in SCALING_FACTORS:
+            yield f"make_2d_surface_from_array {name} x{scaling_factor}", (
+                lambda array=array, scaling_factor=scaling_factor: (
+                    make_2d_surface_from_array(array, scaling_factor=scaling_factor)
+                )
+            )
+
+
+def player_cases() -> Iterator[Case]:
+    """Player.loop walking back and forth"""
+    for scaling_factor in SCALING_FACTORS:
+        player = Player(scaling_factor, (10, 19))
+        events = [
+            pygame.event.Event(pygame.KEYDOWN, key=pygame.K_d),
+            pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a),
+        ]
+
+        def walk(player=player, events=events):
+            events.reverse()
+            player.loop(events[0])
+
+        yield f"Player.loop x{scaling_factor}", drained(walk)
+
+
+def _sliding_click(puzzle: SlidingPuzzle, far: bool) -> Callable[[], object]:
+    """Slide the tile next to the blank, or the whole row, there and back"""
+
+    def click():
+        row_start = puzzle.blank_index - puzzle.blank_index % puzzle.pieces_per_side
+        if puzzle.blank_index == row_start:
+            tile = row_start + (puzzle.pieces_per_side - 1 if far else 1)
+        else:
+            tile = row_start if far else puzzle.blank_index - 1
+        puzzle.move(puzzle.tile_can_move(tile))
+
+    return click
+
+
+def puzzle_cases() -> Iterator[Case]:
+    """Puzzle.image_update and the click path of every puzzle"""
+    image = asset_cache.image("sample_images/Monalisa.png")
+    for size in BOARD_SIZES:
+        flipping = FlippingPuzzle(image, size, PUZZLE_SIZE)
+
+        def redraw_all(puzzle: Puzzle = flipping):
+            for piece in puzzle.pieces:
+                piece.image = piece.image
+            puzzle.image_update()
+
+        yield f"Puzzle.image_update all slots {size}", drained(redraw_all)
+        yield f"Puzzle.image_update no changes {size}", drained(flipping.image_update)
+
+        def flip(puzzle=flipping):
+            puzzle.flip(np.random.randint(puzzle.total_pieces))
+            puzzle.image_update()
+            puzzle.is_solved()
+
+        yield f"FlippingPuzzle click {size}", drained(flip)
+
+        lights_out = LightsOut(image, size, PUZZLE_SIZE)
+
+        def press(puzzle=lights_out):
+            puzzle.press(np.random.randint(puzzle.total_pieces))
+            puzzle.image_update()
+            puzzle.is_solved()
+
+        yield f"LightsOut click {size}", drained(press)
+
+        sliding = SlidingPuzzle(image, size, PUZZLE_SIZE)
+        yield f"SlidingPuzzle click {size}", drained(_sliding_click(sliding, False))
+        yield f"SlidingPuzzle row click {size}", drained(_sliding_click(sliding, True))
+
+        connector = Connector(image, size, PUZZLE_SIZE)
+        free_tiles = [
+            tile for tile in range(connector.total_pieces) if not connector.locked[tile]
+        ]
+
+        def recolor(puzzle=connector, free_tiles=free_tiles):
+            tile = free_tiles[np.random.randint(len(free_tiles))]
+            puzzle.click_tile(tile, False)
+            puzzle.image_update([tile])
+            puzzle.is_solved()
+
+        yield f"Connector click {size}", drained(recolor)
+
+
+def generator_cases() -> Iterator[Case]:
+    """Generating Connector boards, and solving them from their clues"""
+    for size in GENERATOR_SIZES:
+        solver = ConnectorSolver(size)
+        for difficulty in GENERATOR_DIFFICULTIES:
+            rng = random.Random(0)
+
+            def generate(solver=solver, difficulty=difficulty, rng=rng):
+                return solver.generate(3, difficulty, rng)
+
+            def generate_and_solve(generate=generate, solver=solver):
+                clues, _ = generate()
+                return solver.solve(clues)
+
+            yield f"Connector generate {size} at {difficulty}", generate
+            yield f"Connector generate+solve {size} at {difficulty}", generate_and_solve
+
+
+def run(name_filter: str) -> dict[str, float]:
+    """Time every case whose name contains name_filter"""
+    np.random.seed(0)
+    results = {}
+    for cases in (
+        map_cases,
+        surface_cases,
+        player_cases,
+        puzzle_cases,
+        generator_cases,
+    ):
+        for name, function in cases():
+            if name_filter in name:
+                results[name] = time_per_call(function)
+                print(f"{name:<48}{results[name] * 1e6:>12.1f} us", flush=True)
+    return results
+
+
+def compare(
+    results: dict[str, float], baseline: dict[str, float], tolerance: float
+) -> list[str]:
+    """Print the change against the baseline and get the cases that regressed"""
+    regressions = []
+    print(f"\n{'case':<48}{'us/call':>12}{'baseline':>12}{'change':>10}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            print(f"{name:<48}{seconds * 1e6:>12.1f}{'-':>12}{'new':>10}")
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(
+            f"{name:<48}{seconds * 1e6:>12.1f}{baseline[name] * 1e6:>12.1f}"
+            f"{change:>+10.0%}{flag}"
+        )
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmarks, returns the exit status"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run matching cases")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="store as baseline")
+    parser.add_argument(
+        "--compare", action="store_true", help="fail on slower than baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="allowed slowdown before a case fails, 0.5 is 50%%",
+    )
+    args = parser.parse_args()
+
+    results = run(args.filter)
+    status = 0
+    if args.compare:
+        stored = json.loads(args.baseline.read_text())
+        regressions = compare(results, stored["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline")
+            status = 1
+    if args.save:
+        baseline = {"results": results}
+        if args.baseline.exists():
+            # Keep the cases that were filtered out of this run
+            stored = json.loads(args.baseline.read_text())
+            baseline["results"] = {**stored["results"], **results}
+        baseline["machine"] = {
+            "python": sys.version.split()[0],
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        }
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"\nSaved {len(results)} case(s) to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    sys.exit(main())
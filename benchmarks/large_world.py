@@ -0,0 +1,111 @@
+"""Load a huge tile map and walk across it, timing ChunkedGameMap
+
+Run from the repository root with `python -m benchmarks.large_world`. The
+first run writes a map of random tiles from the game's tilesets to
+.cache/large_world, later runs reuse it.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from assets import asset_cache
+from GameMap.tile_map import ChunkedGameMap, TileMap
+from helpers import CACHE_DIRECTORY
+
+MAP_TILES = 10_000
+TILE_PIXEL_SIZE = (16, 12)
+SCREEN_SIZE = np.array((1920, 1080))
+SCALING_FACTOR = 4
+STEPS = 2000
+# Rows of the map written at once, so writing it needs little memory
+WRITE_ROWS = 500
+
+
+def write_world(size: int) -> TileMap:
+    """Write a map of random tiles, or load it if it was written before"""
+    directory = CACHE_DIRECTORY / f"large_world_{size}"
+    try:
+        return TileMap.load(directory)
+    except (OSError, ValueError):
+        pass
+    tilesets = TileMap.from_images(
+        {
+            "floor": asset_cache.array("GameMap/floor_surface.png"),
+            "deco": asset_cache.array("GameMap/deco_surface.png"),
+        },
+        TILE_PIXEL_SIZE,
+    ).tilesets
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0)
+    for name, tileset in tilesets.items():
+        indices = np.lib.format.open_memmap(
+            directory / f"{name}.indices.npy", "w+", np.uint16, (size, size)
+        )
+        for row in range(0, size, WRITE_ROWS):
+            indices[row : row + WRITE_ROWS] = rng.integers(
+                0, len(tileset), (min(WRITE_ROWS, size - row), size), np.uint16
+            )
+        indices.flush()
+        del indices
+        np.save(directory / f"{name}.tiles.npy", tileset)
+    return TileMap.load(directory)
+
+
+def main() -> int:
+    """Print load time, update times and memory of a walk across the map"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=MAP_TILES, help="tiles per side")
+    parser.add_argument("--steps", type=int, default=STEPS)
+    args = parser.parse_args()
+    write_world(args.size)
+
+    start = time.perf_counter()
+    tile_map = TileMap.load(CACHE_DIRECTORY / f"large_world_{args.size}")
+    load_time = time.perf_counter() - start
+    tiles_on_screen = np.ceil(
+        SCREEN_SIZE / (np.array(TILE_PIXEL_SIZE) * SCALING_FACTOR)
+    ).astype(int)
+    game_map = ChunkedGameMap(
+        tile_map, tiles_on_screen, SCALING_FACTOR, np.array((args.size // 2,) * 2)
+    )
+    update_times = []
+    peak_memory = 0
+    for step in range(args.steps):
+        # Walk diagonally, going right twice as often as down
+        shift = (1, 0) if step % 3 else (0, 1)
+        start = time.perf_counter()
+        game_map.update(shift)
+        update_times.append(time.perf_counter() - start)
+        peak_memory = max(peak_memory, game_map.memory_used)
+        # Give the worker the rest of a 60 fps frame, as the game would
+        time.sleep(max(1 / 60 - update_times[-1], 0))
+    game_map.close()
+
+    update_times.sort()
+    print(f"map of {args.size}x{args.size} tiles, {args.steps} steps")
+    print(f"{'load':<24}{load_time * 1000:>10.2f} ms")
+    print(
+        f"{'median update':<24}{update_times[len(update_times) // 2] * 1000:>10.2f} ms"
+    )
+    print(
+        f"{'99th percentile update':<24}"
+        f"{update_times[len(update_times) * 99 // 100] * 1000:>10.2f} ms"
+    )
+    # The first update renders the visible chunks before any were streamed
+    print(f"{'slowest update':<24}{update_times[-1] * 1000:>10.2f} ms")
+    print(f"{'chunks rendered':<24}{game_map.chunks_rendered:>10}")
+    print(f"{'peak chunk memory':<24}{peak_memory / 2**20:>10.1f} MiB")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{'peak process memory':<24}{max_rss / 2**10:>10.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Compare per-call cost of the surface helpers
+
+Run from the repository root with `python -m benchmarks.surface_allocations`
+"""
+import os
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+import pygame
+
+from helpers import array_to_surface, make_2d_surface_from_array
+
+CALLS = 200
+
+
+def measure(function: Callable[[], object]) -> tuple[float, int, int]:
+    """Measure a call in steady state
+
+    Returns:
+        Average seconds per call, average peak bytes per call and bytes still
+        allocated after all calls
+    """
+    # Warm up so caches and targets exist before measuring
+    function()
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        function()
+    elapsed = (time.perf_counter() - start) / CALLS
+
+    peak_total = 0
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for _ in range(CALLS):
+        tracemalloc.reset_peak()
+        function()
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    leaked = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return elapsed, peak_total // CALLS, leaked
+
+
+def main():
+    """Print a table of the legacy and reusable-target surface paths"""
+    rng = np.random.default_rng(0)
+    print(f"{'case':<40}{'us/call':>10}{'peak B/call':>14}{'kept B':>10}")
+    for shape, scaling_factor in (((12, 16, 3), 4), ((432, 560, 4), 4)):
+        array = rng.integers(0, 256, shape, dtype=np.uint8)
+        target = array_to_surface(array, scaling_factor=scaling_factor)
+        cases = {
+            "make_2d_surface_from_array": lambda: make_2d_surface_from_array(
+                array, scaling_factor=scaling_factor
+            ),
+            "array_to_surface, new surface": lambda: array_to_surface(
+                array, scaling_factor=scaling_factor
+            ),
+            "array_to_surface, reused target": lambda: array_to_surface(array, target),
+        }
+        print(f"{shape} x{scaling_factor}")
+        for name, function in cases.items():
+            elapsed, peak, leaked = measure(function)
+            print(f"  {name:<38}{elapsed * 1e6:>10.1f}{peak:>14}{leaked:>10}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    main()
@@ -1,10 +1,104 @@
+import pathlib
+import threading
+from collections import defaultdict, deque
 from enum import Enum, auto
-from typing import Any
+from typing import Any, Callable, Hashable, Sequence
 
 import numpy as np
 import numpy.typing as npt
 import pygame
 
+# Where data that is slow to build but can be rebuilt at any time gets stored
+CACHE_DIRECTORY = pathlib.Path(__file__).parent / ".cache"
+# Most areas folded PUZZLE_SPRITE_UPDATE events list, past this they are redrawn
+# as the one area around all of them, which is cheaper than merging them
+MAX_DIRTY_RECTS = 64
+
+
+class SurfaceCounter:
+    """Counts surfaces as they are created, for profiling
+
+    Only surfaces that are passed to add are counted. The game adds every
+    surface it makes that owns pixel memory: those made by array_to_surface,
+    the color tiles of Connector, text it renders and the profiler's overlay.
+    Subsurfaces share the pixels of their parent and are not counted, nor are
+    surfaces pygame makes on its own, like the display surface. Surfaces can be
+    added from any thread.
+
+    Attributes:
+        surfaces: How many surfaces were created
+        bytes: Bytes of pixel memory of those surfaces
+    """
+
+    __slots__ = ("surfaces", "bytes", "_lock")
+
+    def __init__(self):
+        self.surfaces = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, surface: pygame.Surface) -> pygame.Surface:
+        """Count a newly created surface
+
+        Returns:
+            The surface, so creating and counting can be done in one go
+        """
+        size = surface.get_pitch() * surface.get_height()
+        with self._lock:
+            self.surfaces += 1
+            self.bytes += size
+        return surface
+
+
+# Every surface the game creates is counted here
+surface_counter = SurfaceCounter()
+
+
+def array_to_surface(
+    array: npt.NDArray[np.uint8],
+    target: pygame.Surface | None = None,
+    scaling_factor: int = 1,
+    color_key: tuple[int, int, int] | None = None,
+) -> pygame.Surface:
+    """Draw an image array into a surface, accepts both RGB and RGBA arrays
+
+    The array is wrapped in place with pygame.image.frombuffer and scaled by SDL
+    straight into the target, so with a reused target no pixel memory is
+    allocated. RGBA arrays keep their alpha channel.
+
+    Args:
+        array: Any uint8 array of shape (y, x, 3) or (y, x, 4), as returned by PIL
+        target: Surface to draw into, its size decides the scaling. Must have the
+            format of a surface previously returned for the same kind of array
+        scaling_factor: Make the image bigger by scaling_factor, ignored if a
+            target is given
+        color_key: What color to key for transparency, None by default
+    """
+    if array.ndim != 3 or array.shape[2] not in (3, 4):
+        raise ValueError(
+            f"Must be an array with shape (n, m, 3) or (n, m, 4), "
+            f"received array is {array.shape}"
+        )
+    # Only copies if the array is a non-contiguous view or not uint8
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    source = pygame.image.frombuffer(
+        array,
+        (array.shape[1], array.shape[0]),
+        "RGBA" if array.shape[2] == 4 else "RGB",
+    )
+    if target is None:
+        target = pygame.Surface(
+            (array.shape[1] * scaling_factor, array.shape[0] * scaling_factor),
+            source.get_flags() & pygame.SRCALPHA,
+            source.get_bitsize(),
+            source.get_masks(),
+        )
+        surface_counter.add(target)
+    pygame.transform.scale(source, target.get_size(), target)
+    if color_key is not None:
+        target.set_colorkey(color_key)
+    return target
+
 
 def make_2d_surface_from_array(
     array: npt.NDArray[np.int_],
@@ -14,25 +108,95 @@ def make_2d_surface_from_array(
 ) -> pygame.Surface:
     """Make a 2d surface from a numpy array, accepts both RGB and RGBA arrays
 
+    Drops the alpha channel of RGBA arrays in favour of a color key, use
+    array_to_surface to keep it or to draw into an existing surface.
+
     Args:
         array: Any sequence of shape (n, m, 3) or (n, m, 4)
         swap_xy: By default, images from PIL need their x/y dims to be swapped
         color_key: What color to key for alpha in RGBA images, ignored for RGB images
         scaling_factor: Make the image bigger by scaling_factor
     """
-    array = np.array(array)
+    array = np.asarray(array)
     if len(array.shape) != 3 or array.shape[2] not in (3, 4):
         raise ValueError(
             f"Must be an array with shape (n, m, 3) or (n, m, 4), "
             f"received array is {array.shape}"
         )
-    array = array.repeat(scaling_factor, axis=0).repeat(scaling_factor, axis=1)
-    if swap_xy:
+    if not swap_xy:
         array = np.swapaxes(array, 0, 1)
-    temp_surface = pygame.surfarray.make_surface(array[:, :, :3])
-    if array.shape[2] == 4:
-        temp_surface.set_colorkey(color_key)
-    return temp_surface
+    return array_to_surface(
+        array[:, :, :3],
+        scaling_factor=scaling_factor,
+        color_key=color_key if array.shape[2] == 4 else None,
+    )
+
+
+class SpriteAtlas:
+    """Packs scaled sprite frames into a single surface
+
+    Every key gets one row of the atlas with its frames laid out left to right,
+    the frames are handed out as subsurfaces so looking one up copies nothing.
+
+    Args:
+        frames: Mapping of key to a sequence of RGBA/RGB image arrays from PIL,
+            all arrays need the same amount of channels
+        scaling_factor: Make the frames bigger by scaling_factor
+    """
+
+    def __init__(
+        self,
+        frames: dict[Hashable, Sequence[npt.NDArray[np.uint8]]],
+        scaling_factor: int = 1,
+    ):
+        self.scaling_factor = scaling_factor
+        arrays = [array for key_frames in frames.values() for array in key_frames]
+        row_heights = [max(array.shape[0] for array in fs) for fs in frames.values()]
+        atlas_array = np.zeros(
+            (
+                sum(row_heights),
+                max(sum(array.shape[1] for array in fs) for fs in frames.values()),
+                arrays[0].shape[2],
+            ),
+            np.uint8,
+        )
+        rects: dict[Hashable, list[pygame.Rect]] = {}
+        y = 0
+        for (key, key_frames), row_height in zip(frames.items(), row_heights):
+            x = 0
+            rects[key] = []
+            for array in key_frames:
+                height, width = array.shape[:2]
+                atlas_array[y : y + height, x : x + width] = array
+                rects[key].append(
+                    pygame.Rect(
+                        x * scaling_factor,
+                        y * scaling_factor,
+                        width * scaling_factor,
+                        height * scaling_factor,
+                    )
+                )
+                x += width
+            y += row_height
+        self.surface = array_to_surface(atlas_array, scaling_factor=scaling_factor)
+        self._frames: dict[Hashable, list[pygame.Surface]] = {
+            key: [self.surface.subsurface(rect) for rect in key_rects]
+            for key, key_rects in rects.items()
+        }
+
+    def get(self, key: Hashable, frame: int = 0) -> pygame.Surface:
+        """Get a frame of a sprite, the frame index wraps around
+
+        Args:
+            key: Key the frames were stored under
+            frame: Index of the frame, 0 by default
+        """
+        key_frames = self._frames[key]
+        return key_frames[frame % len(key_frames)]
+
+    def frame_count(self, key: Hashable) -> int:
+        """Get the amount of frames stored for a key"""
+        return len(self._frames[key])
 
 
 class EventTypes(Enum):
@@ -59,6 +223,8 @@ class Event:
         data: Stored data of the event, default None
     """
 
+    __slots__ = ("type", "data")
+
     def __init__(self, event_type: Enum, event_data: Any = None):
         self.type = event_type
         self.data = event_data
@@ -70,25 +236,115 @@ class Event:
             return NotImplemented
 
 
-# TODO: this shouldn't be a class
-class EventHandler:
-    """Static event handler that stores a list of Events, then clears on read"""
+class EventBus:
+    """Queue of Events that are dispatched to handlers registered per event type
+
+    Events can be added from any thread. An event of a type with a coalescing
+    rule is folded into the last queued event of its type instead of being
+    queued again, unless an event of a type without a rule was queued in
+    between, so the order of those events is kept.
+    """
+
+    def __init__(self):
+        self._queue: deque[Event] = deque()
+        self._handlers: defaultdict[Enum, list[Callable[[Event], None]]] = defaultdict(
+            list
+        )
+        self._coalescing: dict[Enum, Callable[[Any, Any], Any]] = {}
+        # Last queued event of every coalescing type since the last other event
+        self._foldable: dict[Enum, Event] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type: Enum, handler: Callable[[Event], None]) -> None:
+        """Call handler with every dispatched event of a type"""
+        self._handlers[event_type].append(handler)
+
+    def unsubscribe(self, event_type: Enum, handler: Callable[[Event], None]) -> None:
+        """Stop calling a handler subscribed with subscribe"""
+        self._handlers[event_type].remove(handler)
 
-    _events: list[Event] = []
+    def set_coalescing(
+        self, event_type: Enum, combine: Callable[[Any, Any], Any] | None
+    ) -> None:
+        """Fold events of a type together
 
-    @staticmethod
-    def add(event: Enum, data: Any = None) -> None:
+        Args:
+            event_type: Enum for event
+            combine: Takes the data of the queued event and of the new one and
+                returns the data of the folded event, None to stop folding
+        """
+        with self._lock:
+            if combine is None:
+                self._coalescing.pop(event_type, None)
+                self._foldable.pop(event_type, None)
+            else:
+                self._coalescing[event_type] = combine
+
+    def add(self, event: Enum, data: Any = None) -> None:
         """Adds an event to be handled
 
         Args:
             event: Enum for event
             data: Data to be stored with the event
         """
-        EventHandler._events.append(Event(event, data))
-
-    @staticmethod
-    def get() -> list[Event]:
-        """Gets all events from the handler and clears the internal storage"""
-        temp_list = EventHandler._events
-        EventHandler._events = []
-        return temp_list
+        with self._lock:
+            combine = self._coalescing.get(event)
+            if combine is None:
+                self._foldable.clear()
+            elif event in self._foldable:
+                queued = self._foldable[event]
+                queued.data = combine(queued.data, data)
+                return
+            new_event = Event(event, data)
+            if combine is not None:
+                self._foldable[event] = new_event
+            self._queue.append(new_event)
+
+    def has_events(self) -> bool:
+        """Whether any events are waiting to be handled"""
+        return bool(self._queue)
+
+    def get(self) -> list[Event]:
+        """Gets all events from the queue and clears it"""
+        with self._lock:
+            events = list(self._queue)
+            self._queue.clear()
+            self._foldable.clear()
+        return events
+
+    def dispatch(self) -> int:
+        """Call the handlers of every queued event, in order
+
+        Events added by handlers are left for the next dispatch.
+
+        Returns:
+            How many events were dispatched
+        """
+        events = self.get()
+        for event in events:
+            for handler in self._handlers.get(event.type, ()):
+                handler(event)
+        return len(events)
+
+
+def _add_shifts(first: Sequence[int], second: Sequence[int]) -> tuple[int, int]:
+    return first[0] + second[0], first[1] + second[1]
+
+
+def _merge_rects(
+    first: list[pygame.Rect], second: list[pygame.Rect]
+) -> list[pygame.Rect]:
+    # Once folded into one area, later areas inside it change nothing
+    if len(first) == 1 and first[0].unionall(second) == first[0]:
+        return first
+    if len(first) + len(second) > MAX_DIRTY_RECTS:
+        return [pygame.Rect(first[0] if first else second[0]).unionall(first + second)]
+    seen = {tuple(rect) for rect in first}
+    return first + [rect for rect in second if tuple(rect) not in seen]
+
+
+EventHandler = EventBus()
+# Many of these can come in a frame, but each only needs to be drawn once
+EventHandler.set_coalescing(EventTypes.MAP_POSITION_UPDATE, _add_shifts)
+EventHandler.set_coalescing(EventTypes.PLAYER_SPRITE_UPDATE, lambda first, _: first)
+EventHandler.set_coalescing(EventTypes.PUZZLE_SPRITE_UPDATE, _merge_rects)
@@ -1,30 +1,61 @@
+import argparse
 import pathlib
 from types import SimpleNamespace
 
 import numpy as np
-import PIL.Image
 import pygame
 
-from GameMap.game_map import GameMap
-from helpers import EventHandler, EventTypes
+from GameMap.tile_map import make_game_map
+from helpers import EventHandler, EventTypes, surface_counter
 from Player.player import Player
+from prefetch import PuzzlePrefetcher
+from profiler import FrameProfiler
 from Puzzles.connector_puzzle import Connector
 from Puzzles.flipping_puzzle import FlippingPuzzle
 from Puzzles.lights_out_puzzle import LightsOut
 from Puzzles.sliding_puzzle import SlidingPuzzle
+from renderer import DirtyRectRenderer
+from scheduler import FrameScheduler
 
 
 def switch_puzzle(puzzle_index, puzzle_list: list):
     """Changes the active puzzle"""
-    my_image = PIL.Image.open(puzzle_list[puzzle_index][1])
+    my_image = puzzle_list[puzzle_index][1]
     my_pieces = puzzle_list[puzzle_index][2]
     my_puzzle = puzzle_list[puzzle_index][0](my_image, my_pieces, (380, 500))
     return my_puzzle
 
 
+def positive_int(text: str) -> int:
+    """Parse a whole number above 0, for argparse"""
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"{text} is not above 0")
+    return value
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escape the room by solving puzzles")
+    parser.add_argument(
+        "--fps", type=positive_int, default=60, help="most frames to draw per second"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every frame and show the overlay, F3 toggles it in game",
+    )
+    parser.add_argument(
+        "--trace",
+        type=pathlib.Path,
+        help="write the timings of every frame to a .csv or .json file on exit",
+    )
+    parser.add_argument(
+        "--profile-allocations",
+        action="store_true",
+        help="also record bytes allocated every frame, which is a lot slower",
+    )
+    args = parser.parse_args()
     directory = (pathlib.Path(__file__) / "..").resolve()
-    current_puzzle = 0
     puzzles = [
         (FlippingPuzzle, directory / "sample_images/Monalisa.png", 4),
         (SlidingPuzzle, directory / "sample_images/Monalisa.png", 4),
@@ -45,7 +76,6 @@ if __name__ == "__main__":
     running = True
 
     screen.fill((255, 0, 0))
-    active_puzzle = None
     # screen.blit(active_puzzle.image, (0, 0))
     tile_pixel_size = np.array((16, 12))
     scaling_factor = 4
@@ -58,7 +88,7 @@ if __name__ == "__main__":
     # offset to get the player in the middle of the tiles
     middle_tile_pixel_location += tile_pixel_size // 2
     starting_offset = np.array((2, 10))
-    game_map = GameMap(
+    game_map = make_game_map(
         directory / "GameMap/floor_surface.png",
         directory / "GameMap/deco_surface.png",
         tile_pixel_size,
@@ -69,67 +99,189 @@ if __name__ == "__main__":
     magic_player_offset = (fitting_tile_amount) // 2 + (0, 1)
     player = Player(scaling_factor, starting_offset + magic_player_offset)
     game_map.update((0, 0))
-    screen.blit(game_map.floor_surface, (0, 0))
-    screen.blit(game_map.deco_surface, (0, 0))
-    screen.blit(player.image, tuple(middle_tile_pixel_location))
+    player_rect = pygame.Rect(
+        tuple(middle_tile_pixel_location), player.image.get_size()
+    )
+    renderer = DirtyRectRenderer(screen)
+    scheduler = FrameScheduler(args.fps)
+    profiler = FrameProfiler(
+        enabled=args.profile or args.trace is not None,
+        keep_trace=args.trace is not None,
+        track_allocations=args.profile_allocations,
+    )
+    # Build the puzzles in the background while the player walks to them
+    prefetcher = PuzzlePrefetcher(
+        lambda index: switch_puzzle(index, puzzles), len(puzzles)
+    )
+    prefetcher.prefetch(0)
     EventHandler.get()
 
-    internal_state = SimpleNamespace(in_interaction=False, current_interaction=None)
+    internal_state = SimpleNamespace(
+        in_interaction=False,
+        current_interaction=None,
+        active_puzzle=None,
+        show_puzzle=False,
+        current_puzzle=None,
+        solved_puzzles=set(),
+        # Redraws asked for by the events of a frame, done once after dispatching
+        redraw_all=False,
+        redraw_areas=[],
+        show_profiler=args.profile,
+        # Where the profiler overlay was drawn last frame
+        overlay_rect=None,
+    )
+
+    def scene_layers():
+        """The surfaces that make up the screen, bottom first"""
+        player_layer = (player.image, player_rect.topleft)
+        layers = list(game_map.floor_layers)
+        if player.z_layer:
+            layers += [player_layer, *game_map.deco_layers]
+        else:
+            layers += [*game_map.deco_layers, player_layer]
+        if internal_state.show_puzzle:
+            layers.append((internal_state.active_puzzle.image, (0, 0)))
+        return layers
+
+    def on_map_position_update(game_event):
+        """Scroll the map by the summed shift of the frame"""
+        # Scrolling changes every pixel, so this is a full redraw
+        with profiler.phase("map update"):
+            game_map.update(game_event.data)
+        internal_state.redraw_all = True
+
+    def on_player_sprite_update(game_event):
+        """Redraw the player once the events are dispatched"""
+        internal_state.redraw_areas.append(player_rect)
 
-    show_puzzle = False
+    def on_interaction(game_event):
+        """Open the puzzle of the interactable the player walked into"""
+        # The room has more interactables than puzzles, they share them in turn
+        puzzle_index = game_event.data % len(puzzles)
+        if (
+            internal_state.in_interaction
+            or puzzle_index in internal_state.solved_puzzles
+        ):
+            return
+        internal_state.current_puzzle = puzzle_index
+        with profiler.phase("puzzle handover"):
+            internal_state.active_puzzle = prefetcher.take(puzzle_index)
+        internal_state.show_puzzle = True
+        internal_state.in_interaction = True
+        internal_state.redraw_areas.append(
+            internal_state.active_puzzle.image.get_rect()
+        )
+
+    def on_exit_interaction(game_event):
+        """Hand the controls back to the player"""
+        internal_state.in_interaction = False
+
+    def on_puzzle_sprite_update(game_event):
+        """Copy the changed parts of the puzzle to the screen"""
+        # The last move of a solved puzzle can come after it was closed
+        if not internal_state.show_puzzle:
+            return
+        with profiler.phase("blits"):
+            for puzzle_rect in game_event.data:
+                screen.blit(
+                    internal_state.active_puzzle.image, puzzle_rect, puzzle_rect
+                )
+                renderer.mark_dirty(puzzle_rect)
+
+    def on_puzzle_solved(game_event):
+        """Close the puzzle, the room is escaped once every puzzle is solved"""
+        EventHandler.add(EventTypes.EXIT_INTERACTION)
+        internal_state.show_puzzle = False
+        internal_state.solved_puzzles.add(internal_state.current_puzzle)
+        if len(internal_state.solved_puzzles) == len(puzzles):
+            screen.fill((0, 0, 0))
+
+            # render text
+            label = surface_counter.add(
+                myfont.render("YOU WIN, CONGRATS ON ESCAPING THE ROOM!", 1, (0, 0, 0))
+            )
+            screen.blit(label, (100, 100))
+            renderer.mark_all_dirty()
+
+    EventHandler.subscribe(EventTypes.MAP_POSITION_UPDATE, on_map_position_update)
+    EventHandler.subscribe(EventTypes.PLAYER_SPRITE_UPDATE, on_player_sprite_update)
+    EventHandler.subscribe(EventTypes.INTERACTION_EVENT, on_interaction)
+    EventHandler.subscribe(EventTypes.EXIT_INTERACTION, on_exit_interaction)
+    EventHandler.subscribe(EventTypes.PUZZLE_SPRITE_UPDATE, on_puzzle_sprite_update)
+    EventHandler.subscribe(EventTypes.PUZZLE_SOLVED, on_puzzle_solved)
+
+    renderer.redraw(scene_layers())
+
+    def toggle_profiler():
+        """Show or hide the profiler overlay, recording frames while shown"""
+        internal_state.show_profiler = not internal_state.show_profiler
+        if internal_state.show_profiler:
+            profiler.enable()
+        else:
+            if args.trace is None:
+                profiler.disable()
+            if internal_state.overlay_rect is not None:
+                internal_state.redraw_areas.append(internal_state.overlay_rect)
+                internal_state.overlay_rect = None
+
+    def tile_at(screen_position):
+        """The map tile under a point of the screen"""
+        # The player is always drawn magic_player_offset tiles into the screen
+        return (
+            player.position
+            - magic_player_offset
+            + np.array(screen_position) // (tile_pixel_size * scaling_factor)
+        )
 
     while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                running = False
-            if not internal_state.in_interaction:
-                player.loop(event)
-            else:
-                active_puzzle.loop(event)
-                screen.blit(active_puzzle.image, (0, 0))
-
-        for game_event in EventHandler.get():
-            if game_event.type == EventTypes.MAP_POSITION_UPDATE:
-                screen.fill((0, 0, 0))
-                game_map.update(game_event.data)
-                screen.blit(game_map.floor_surface, (0, 0))
-                if player.z_layer:
-                    screen.blit(player.image, tuple(middle_tile_pixel_location))
-                    screen.blit(game_map.deco_surface, (0, 0))
+        idle = not (EventHandler.has_events() or renderer.has_changes)
+        events = scheduler.get_events(idle)
+        profiler.begin_frame()
+        with profiler.phase("event pump"):
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    running = False
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    toggle_profiler()
+                if not internal_state.in_interaction:
+                    if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                        player.walk_to(tile_at(event.pos))
+                    player.loop(event)
                 else:
-                    screen.blit(game_map.deco_surface, (0, 0))
-                    screen.blit(player.image, tuple(middle_tile_pixel_location))
-
-                if show_puzzle:
-                    screen.blit(active_puzzle.image, (0, 0))
-            if game_event.type == EventTypes.PLAYER_SPRITE_UPDATE:
-                screen.blit(player.image, tuple(middle_tile_pixel_location))
-            if game_event.type == EventTypes.INTERACTION_EVENT:
-                active_puzzle = switch_puzzle(current_puzzle, puzzles)
-                screen.blit(active_puzzle.image, (0, 0))
-                show_puzzle = True
-                internal_state.in_interaction = True
-
-            if game_event.type == EventTypes.EXIT_INTERACTION:
-                internal_state.in_interaction = False
-            # if game_event.type == EventTypes.PUZZLE_SOLVED:
-            #     if game_event == PlayerEvents.SPRITE_UPDATE:
-            #         screen.blit(player.image, (0, 0))
-            if game_event.type == EventTypes.PUZZLE_SPRITE_UPDATE:
-                screen.blit(active_puzzle.image, (0, 0))
-            if game_event.type == EventTypes.PUZZLE_SOLVED:
-                EventHandler.add(EventTypes.EXIT_INTERACTION)
-                show_puzzle = False
-                current_puzzle += 1
-                if current_puzzle == len(puzzles):
-                    screen.fill(0, 0, 0)
-
-                    # render text
-                    label = myfont.render(
-                        "YOU WIN, CONGRATS ON ESCAPING THE ROOM!", 1, (0, 0, 0)
-                    )
-                    screen.blit(label, (100, 100))
-
-        pygame.display.flip()
+                    with profiler.phase("puzzle update"):
+                        internal_state.active_puzzle.loop(event)
+            if not internal_state.in_interaction and player.follow_path():
+                scheduler.keep_awake()
+
+        with profiler.phase("dispatch"):
+            EventHandler.dispatch()
+        with profiler.phase("blits"):
+            if internal_state.redraw_all:
+                renderer.redraw(scene_layers())
+            else:
+                for area in internal_state.redraw_areas:
+                    renderer.redraw(scene_layers(), area)
+            if internal_state.show_profiler and profiler.history:
+                # The overlay is see-through, so clear last frame's first
+                if internal_state.overlay_rect and not internal_state.redraw_all:
+                    renderer.redraw(scene_layers(), internal_state.overlay_rect)
+                internal_state.overlay_rect = profiler.draw_overlay(
+                    screen, screen.get_rect().topright
+                )
+                renderer.mark_dirty(internal_state.overlay_rect)
+        internal_state.redraw_all = False
+        internal_state.redraw_areas.clear()
+
+        with profiler.phase("flip"):
+            renderer.present()
+        profiler.end_frame()
+        scheduler.end_frame()
+
+    prefetcher.shutdown()
+    game_map.close()
+    if args.trace is not None:
+        profiler.export(args.trace)
+    if args.profile:
+        print("\n".join(prefetcher.report()))
@@ -0,0 +1,140 @@
+import concurrent.futures
+import threading
+import time
+from typing import Callable
+
+from puzzle import Puzzle, updates_not_posted
+
+DEFAULT_MEMORY_BUDGET = 64 * 2**20
+
+
+def puzzle_size_in_bytes(puzzle: Puzzle) -> int:
+    """Estimate the memory a puzzle holds from its image and pieces"""
+    return puzzle.image.get_pitch() * puzzle.image.get_height() + (
+        puzzle.piece_images.nbytes
+    )
+
+
+class PuzzlePrefetcher:
+    """Builds puzzles on a worker thread before they are needed
+
+    Starting from the puzzle passed to prefetch, the following puzzles are
+    built one after the other until the ones built but not taken yet take up
+    memory_budget bytes, so with a big enough budget all of them are ready
+    long before the player gets to them. Taking a puzzle that is not ready
+    yet waits for it, or builds it right away if it was never started.
+
+    Puzzles are built from the worker thread, so building one must not touch
+    anything the main thread uses without a lock. They are built without
+    posting sprite updates, so whoever takes a puzzle draws all of it once.
+
+    Args:
+        build: Builds the puzzle with the given index
+        puzzle_count: How many puzzles there are, indices go from 0 up to it
+        memory_budget: Bytes the built puzzles that were not taken may take up
+
+    Attributes:
+        build_times: Seconds building every built puzzle took
+        wait_times: Seconds take waited for every taken puzzle
+    """
+
+    def __init__(
+        self,
+        build: Callable[[int], Puzzle],
+        puzzle_count: int,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ):
+        self.build = build
+        self.puzzle_count = puzzle_count
+        self.memory_budget = memory_budget
+        self.build_times: dict[int, float] = {}
+        self.wait_times: dict[int, float] = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="puzzle-prefetch"
+        )
+        self._futures: dict[int, concurrent.futures.Future[Puzzle]] = {}
+        # Bytes of every built puzzle that was not taken yet
+        self._ready_sizes: dict[int, int] = {}
+        self._taken: set[int] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _build_timed(self, index: int) -> Puzzle:
+        start = time.perf_counter()
+        with updates_not_posted():
+            puzzle = self.build(index)
+        self.build_times[index] = time.perf_counter() - start
+        return puzzle
+
+    def _on_built(self, index: int, future: concurrent.futures.Future[Puzzle]):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            if index not in self._futures:
+                return
+            self._ready_sizes[index] = puzzle_size_in_bytes(future.result())
+            in_budget = sum(self._ready_sizes.values()) < self.memory_budget
+        if in_budget:
+            self.prefetch(index + 1)
+
+    def prefetch(self, index: int):
+        """Start building a puzzle, and the ones after it while in budget
+
+        If the puzzle is already built or being built, the first puzzle after
+        it that is not is started instead, as long as there is budget left.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            while index in self._futures or index in self._taken:
+                # A puzzle still being built starts the next one when done
+                if index in self._futures and not self._futures[index].done():
+                    return
+                if sum(self._ready_sizes.values()) >= self.memory_budget:
+                    return
+                index += 1
+            if not 0 <= index < self.puzzle_count:
+                return
+            future = self._executor.submit(self._build_timed, index)
+            self._futures[index] = future
+        future.add_done_callback(lambda future: self._on_built(index, future))
+
+    def take(self, index: int) -> Puzzle:
+        """Get a built puzzle and start building the next one
+
+        Raises:
+            Exception: Whatever building the puzzle raised
+        """
+        start = time.perf_counter()
+        with self._lock:
+            future = self._futures.pop(index, None)
+            self._ready_sizes.pop(index, None)
+            self._taken.add(index)
+        if future is None:
+            puzzle = self._build_timed(index)
+        else:
+            puzzle = future.result()
+        self.wait_times[index] = time.perf_counter() - start
+        # A taken puzzle frees up budget for the ones after it
+        self.prefetch(index + 1)
+        return puzzle
+
+    def report(self) -> list[str]:
+        """Lines with how long building and waiting for every puzzle took"""
+        return [
+            f"puzzle {index}: built in {self.build_times[index] * 1000:.1f}ms, "
+            + (
+                f"waited {self.wait_times[index] * 1000:.1f}ms"
+                if index in self.wait_times
+                else "not taken"
+            )
+            for index in sorted(self.build_times)
+        ]
+
+    def shutdown(self):
+        """Stop building, puzzles being built are finished but not kept"""
+        with self._lock:
+            self._closed = True
+            self._futures.clear()
+            self._ready_sizes.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,200 @@
+import collections
+import contextlib
+import csv
+import json
+import pathlib
+import time
+import tracemalloc
+from typing import Iterator
+
+import pygame
+
+from helpers import surface_counter
+
+OVERLAY_BACKGROUND = (0, 0, 0, 190)
+OVERLAY_TEXT_COLOR = (255, 255, 255)
+OVERLAY_FONT_SIZE = 16
+
+
+class FrameProfiler:
+    """Times the phases of every frame and counts what the frame allocated
+
+    Phases can be nested, a phase's time does not include the phases inside
+    it, so the phases of a frame add up to its total. While disabled, phase
+    does nothing and no frames are recorded.
+
+    Args:
+        enabled: Whether to start recording straight away
+        history_size: How many frames the overlay averages over
+        keep_trace: Whether to keep every frame for export, not just the recent
+        track_allocations: Whether to record the bytes allocated by Python
+            code every frame with tracemalloc, which slows everything down
+
+    Attributes:
+        enabled: Whether frames are being recorded
+        history: Records of the most recent frames
+        trace: Records of every frame since enabling, None unless keep_trace
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        history_size: int = 120,
+        keep_trace: bool = False,
+        track_allocations: bool = False,
+    ):
+        self.enabled = False
+        self.history: collections.deque[dict[str, float]] = collections.deque(
+            maxlen=history_size
+        )
+        self.trace: list[dict[str, float]] | None = [] if keep_trace else None
+        self.track_allocations = track_allocations
+        self._frame_number = 0
+        self._record: dict[str, float] | None = None
+        self._frame_start = 0.0
+        # Seconds spent in the phases inside each currently open phase
+        self._nested: list[float] = []
+        self._surfaces_at_start = 0
+        self._surface_bytes_at_start = 0
+        self._heap_at_start = 0
+        self._font: pygame.font.Font | None = None
+        # The overlay's lines as last rendered and the panel they are drawn on
+        self._overlay_lines: list[tuple[str, pygame.Surface]] = []
+        self._panel: pygame.Surface | None = None
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        """Start recording frames"""
+        if self.enabled:
+            return
+        self.enabled = True
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        """Stop recording frames"""
+        self.enabled = False
+        self._record = None
+        if self.track_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def begin_frame(self):
+        """Start recording a frame"""
+        if not self.enabled:
+            return
+        self._record = {"frame": self._frame_number}
+        self._frame_number += 1
+        self._surfaces_at_start = surface_counter.surfaces
+        self._surface_bytes_at_start = surface_counter.bytes
+        if self.track_allocations:
+            tracemalloc.reset_peak()
+            self._heap_at_start = tracemalloc.get_traced_memory()[0]
+        self._frame_start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the code in a with block as a phase of the current frame"""
+        if self._record is None:
+            yield
+            return
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            if self._record is not None:
+                self._record[name] = self._record.get(name, 0.0) + elapsed - nested
+
+    def end_frame(self):
+        """Finish recording the current frame"""
+        record = self._record
+        if record is None:
+            return
+        record["total"] = time.perf_counter() - self._frame_start
+        record["surfaces"] = surface_counter.surfaces - self._surfaces_at_start
+        record["surface_bytes"] = surface_counter.bytes - self._surface_bytes_at_start
+        if self.track_allocations:
+            record["heap_bytes"] = (
+                tracemalloc.get_traced_memory()[1] - self._heap_at_start
+            )
+        self.history.append(record)
+        if self.trace is not None:
+            self.trace.append(record)
+        self._record = None
+
+    def averages(self) -> dict[str, float]:
+        """Average of every recorded value over the recent frames"""
+        totals: dict[str, float] = collections.defaultdict(float)
+        for record in self.history:
+            for name, value in record.items():
+                totals[name] += value
+        return {
+            name: total / len(self.history)
+            for name, total in totals.items()
+            if name != "frame"
+        }
+
+    def draw_overlay(
+        self, surface: pygame.Surface, topright: tuple[int, int]
+    ) -> pygame.Rect:
+        """Draw the recent averages onto a surface, right aligned to topright
+
+        Only lines that changed since the last call are rendered again, and
+        the panel behind them is reused while its size stays the same.
+
+        Returns:
+            The area that was drawn over
+        """
+        if self._font is None:
+            self._font = pygame.font.SysFont("monospace", OVERLAY_FONT_SIZE)
+        averages = self.averages()
+        lines = [f"frames {len(self.history):>4}"]
+        for name, value in averages.items():
+            if name in ("surfaces", "surface_bytes", "heap_bytes"):
+                lines.append(f"{name:<14}{value:>10.0f}")
+            else:
+                lines.append(f"{name:<14}{value * 1000:>8.2f}ms")
+        changed = len(lines) != len(self._overlay_lines)
+        del self._overlay_lines[len(lines) :]
+        for row, line in enumerate(lines):
+            if row < len(self._overlay_lines) and self._overlay_lines[row][0] == line:
+                continue
+            text = surface_counter.add(
+                self._font.render(line, True, OVERLAY_TEXT_COLOR)
+            )
+            if row < len(self._overlay_lines):
+                self._overlay_lines[row] = (line, text)
+            else:
+                self._overlay_lines.append((line, text))
+            changed = True
+        line_height = self._font.get_linesize()
+        size = (
+            max(text.get_width() for _, text in self._overlay_lines) + 8,
+            line_height * len(self._overlay_lines) + 8,
+        )
+        if self._panel is None or self._panel.get_size() != size:
+            self._panel = surface_counter.add(pygame.Surface(size, pygame.SRCALPHA))
+            changed = True
+        if changed:
+            self._panel.fill(OVERLAY_BACKGROUND)
+            for row, (_, text) in enumerate(self._overlay_lines):
+                self._panel.blit(text, (4, 4 + row * line_height))
+        return surface.blit(self._panel, self._panel.get_rect(topright=topright))
+
+    def export(self, path: pathlib.Path):
+        """Write every traced frame to a .json file, or a .csv file otherwise"""
+        frames = self.trace if self.trace is not None else list(self.history)
+        path = pathlib.Path(path)
+        if path.suffix == ".json":
+            path.write_text(json.dumps(frames, indent=1))
+            return
+        columns = list(dict.fromkeys(name for record in frames for name in record))
+        with path.open("w", newline="") as file:
+            writer = csv.DictWriter(file, columns, restval=0)
+            writer.writeheader()
+            writer.writerows(frames)
@@ -1,8 +1,33 @@
+import contextlib
+import pathlib
+import threading
+from typing import Iterable, Iterator
+
 import numpy as np
 import numpy.typing as npt
-import PIL
+import PIL.Image
+import pygame
+
+from assets import asset_cache
+from helpers import EventHandler, EventTypes, array_to_surface
+
+# Whether image_update posts PUZZLE_SPRITE_UPDATE, set per thread
+_posting = threading.local()
+
 
-from helpers import EventHandler, EventTypes, make_2d_surface_from_array
+@contextlib.contextmanager
+def updates_not_posted() -> Iterator[None]:
+    """Keep image_update from posting sprite updates in a with block
+
+    Only affects the thread the block runs on, so puzzles can be built in the
+    background without their drawing reaching the game's event queue.
+    """
+    previous = getattr(_posting, "enabled", True)
+    _posting.enabled = False
+    try:
+        yield
+    finally:
+        _posting.enabled = previous
 
 
 class Puzzle:
@@ -15,7 +40,9 @@ class Puzzle:
 
     Args:
         image:
-            A PIL image, returned by Image.open('some_image_file.png').
+            A PIL image, returned by Image.open('some_image_file.png'), or the
+            path of an image. The pieces cut from a path are cached, in memory
+            and on disk, so the image is only resized once for every size.
 
         pieces_per_side:
             Determines how many pieces the puzzle is cut into.
@@ -42,9 +69,19 @@ class Puzzle:
             and total_pieces is 25.
 
         image:
-            this is how the puzzle currently looks.
+            this is how the puzzle currently looks, as a pygame Surface that is
+            kept and redrawn in place by image_update().
             On initialization the puzzle looks like the input image.
 
+        piece_images:
+            the original images of all pieces in one contiguous array of shape
+            (rows, cols, piece height, piece width, channels). The image of every
+            PuzzlePiece starts out as a view into it.
+
+        dirty_rects:
+            the areas of image that changed in the last image_update(),
+            relative to the top-left of the puzzle.
+
         orderlist:
             This is a list of length total_pieces containing the order of the pieces.
             For instance if pieces_per_side is 2, then orderlist starts as [0, 1, 2, 3]
@@ -59,7 +96,7 @@ class Puzzle:
 
     def __init__(
         self,
-        image: PIL.Image.Image,
+        image: PIL.Image.Image | str | pathlib.Path,
         pieces_per_side: int,
         output_size: tuple[int, int],
         puzzle_pos: tuple[int, int],
@@ -67,58 +104,80 @@ class Puzzle:
         self.output_size = output_size
         self.pieces_per_side = pieces_per_side
         self.total_pieces = pieces_per_side**2
-        self.image, self.shape, self.pieces = self.modify_image(image, output_size)
+        board, self.shape, self.pieces = self.modify_image(image, output_size)
+        self.image = array_to_surface(board)
         self.orderlist = list(range(0, self.total_pieces))
         self.puzzle_x, self.puzzle_y = puzzle_pos
+        self.dirty_rects: list[pygame.Rect] = []
+        # (piece index, piece version) currently drawn in every slot of image
+        self._drawn_slots: list[tuple[int, int] | None] = [None] * self.total_pieces
+        # piece index -> (piece version, surface of the piece)
+        self._piece_surfaces: dict[int, tuple[int, pygame.Surface]] = {}
 
-    def modify_image(self, image: PIL.Image.Image, output_size: tuple[int, int]):
+    def modify_image(
+        self,
+        image: PIL.Image.Image | str | pathlib.Path,
+        output_size: tuple[int, int],
+    ):
         """Resizes the input image to the output size.
 
-        Splits the image into total_pieces parts, then creates a PuzzlePiece object from
-        the image. PuzzlePiece object is stored in a list called pieces. Raises an
-        Exception if the resized image cannot be divided into total_pieces without
-        remainder.
-
-        Raises:
-            SomeException: resized image cannot be divided into total_pieces without
-            remainder  TODO: What exception?
+        Shrinks the image until it divides into total_pieces parts without remainder,
+        then reshapes it into piece_images and creates a PuzzlePiece object viewing
+        each part. PuzzlePiece object is stored in a list called pieces.
+        Images given as a path are resized and cut by asset_cache.pieces instead.
         """
-        if output_size:
-            image = image.resize(output_size)
-        image = image.resize(
+        if not isinstance(image, PIL.Image.Image):
+            self.piece_images = asset_cache.pieces(
+                image,
+                output_size or asset_cache.image(image).size,
+                self.pieces_per_side,
+            )
             (
-                image.size[0] - image.size[0] % self.pieces_per_side,
-                image.size[1] - image.size[0] % self.pieces_per_side,
+                rows,
+                piece_height,
+                cols,
+                piece_width,
+                channels,
+            ) = self.piece_images.swapaxes(1, 2).shape
+            board = self.piece_images.swapaxes(1, 2).reshape(
+                rows * piece_height, cols * piece_width, channels
             )
-        )
-        self.output_size = image.size
-        self.puzzle_scale = (
-            image.size[0] // self.pieces_per_side,
-            image.size[1] // self.pieces_per_side,
-        )
-        pieces: list[npt.NDArray[np.int_]] = []
-        for y in range(self.pieces_per_side):
-            for x in range(self.pieces_per_side):
-                pieces.append(
-                    np.array(
-                        image.crop(
-                            (
-                                x * self.puzzle_scale[0],
-                                y * self.puzzle_scale[1],
-                                (x + 1) * self.puzzle_scale[0],
-                                (y + 1) * self.puzzle_scale[1],
-                            )
-                        )
-                    )
+            self.output_size = (board.shape[1], board.shape[0])
+            self.puzzle_scale = (piece_width, piece_height)
+        else:
+            image = image.convert("RGB")
+            if output_size:
+                image = image.resize(output_size)
+            image = image.resize(
+                (
+                    image.size[0] - image.size[0] % self.pieces_per_side,
+                    image.size[1] - image.size[1] % self.pieces_per_side,
                 )
-
-        assert len(pieces) == self.total_pieces
+            )
+            self.output_size = image.size
+            self.puzzle_scale = (
+                image.size[0] // self.pieces_per_side,
+                image.size[1] // self.pieces_per_side,
+            )
+            board = np.array(image)
+            # (rows, cols, piece height, piece width, channels), every piece is a view
+            self.piece_images = np.ascontiguousarray(
+                board.reshape(
+                    self.pieces_per_side,
+                    self.puzzle_scale[1],
+                    self.pieces_per_side,
+                    self.puzzle_scale[0],
+                    board.shape[2],
+                ).swapaxes(1, 2)
+            )
 
         return_pieces = [
             PuzzlePiece(piece, index_relative, self)
-            for index_relative, piece in enumerate(pieces)
+            for index_relative, piece in enumerate(
+                self.piece_images.reshape(-1, *self.piece_images.shape[2:])
+            )
         ]
-        return image, np.array(image).shape, return_pieces
+        return board, board.shape, return_pieces
 
     def get_tile_index_from_pos(self, mouse_pos: tuple[int, int]):
         """
@@ -167,35 +226,75 @@ class Puzzle:
             i.relative_index = i.relative_y * self.pieces_per_side + i.relative_x
             self.orderlist[i.relative_index] = i.absolute_index
 
-    def image_update(self):
+    def image_update(self, changed_slots: Iterable[int] | None = None):
         """
-        image_update():
+        image_update(changed_slots=None):
 
             updates the puzzle image to reflect the order in orderlist.
+            Only redraws the slots whose piece, or the image of whose piece,
+            changed since the last call and stores those areas in dirty_rects.
+            If the caller knows which orderlist indices changed it can pass them
+            as changed_slots, so only those are checked.
             This should be called at the end of every loop where
-            the puzzle is changed
+            the puzzle is changed. The changed areas are posted as a
+            PUZZLE_SPRITE_UPDATE event, unless inside updates_not_posted()
         """
-        temp_array = [
-            np.concatenate(tuple([self.pieces[i].image for i in j]), axis=1)
-            for j in [
-                self.orderlist[
-                    row * self.pieces_per_side : (row + 1) * self.pieces_per_side
-                ]
-                for row in range(self.pieces_per_side)
-            ]
-        ]
-        self.image = make_2d_surface_from_array(
-            np.concatenate(tuple(temp_array), axis=0)
-        )
-        EventHandler.add(EventTypes.PUZZLE_SPRITE_UPDATE)
+        if changed_slots is None:
+            changed_slots = range(self.total_pieces)
+        dirty_rects = []
+        for slot in changed_slots:
+            piece_index = self.orderlist[slot]
+            piece = self.pieces[piece_index]
+            if self._drawn_slots[slot] == (piece_index, piece.version):
+                continue
+            rect = pygame.Rect(
+                slot % self.pieces_per_side * self.puzzle_scale[0],
+                slot // self.pieces_per_side * self.puzzle_scale[1],
+                *self.puzzle_scale,
+            )
+            self.image.blit(self.get_piece_surface(piece_index), rect)
+            self._drawn_slots[slot] = (piece_index, piece.version)
+            dirty_rects.append(rect)
+        self.dirty_rects = dirty_rects
+        if getattr(_posting, "enabled", True):
+            EventHandler.add(EventTypes.PUZZLE_SPRITE_UPDATE, dirty_rects)
+
+    def get_piece_surface(self, piece_index: int) -> pygame.Surface:
+        """
+        get_piece_surface(piece_index):
+
+            returns a surface of the piece at pieces[piece_index], which is
+            only redrawn when the image of the piece has changed
+        """
+        piece = self.pieces[piece_index]
+        version, surface = self._piece_surfaces.get(piece_index, (None, None))
+        if version != piece.version:
+            if surface is not None and surface.get_size() != piece.image.shape[1::-1]:
+                surface = None
+            surface = array_to_surface(piece.image, surface)
+            self._piece_surfaces[piece_index] = (piece.version, surface)
+        return surface
 
 
 class PuzzlePiece:
     """This is a class to store puzzle pieces and the data for them"""
 
+    __slots__ = (
+        "_image",
+        "version",
+        "master",
+        "relative_index",
+        "absolute_index",
+        "relative_y",
+        "relative_x",
+        "x",
+        "y",
+    )
+
     def __init__(
         self, image: npt.NDArray[np.int_], relative_index: int, master: Puzzle
     ):
+        self.version = 0
         self.image = image
         self.master = master
         self.relative_index = relative_index
@@ -205,3 +304,13 @@ class PuzzlePiece:
         )
         self.x = self.relative_x * master.puzzle_scale[0]
         self.y = self.relative_y * master.puzzle_scale[1]
+
+    @property
+    def image(self) -> npt.NDArray[np.int_]:
+        """The image of the piece, assigning a new one bumps version"""
+        return self._image
+
+    @image.setter
+    def image(self, image: npt.NDArray[np.int_]):
+        self._image = image
+        self.version += 1
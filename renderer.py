@@ -0,0 +1,71 @@
+from typing import Sequence
+
+import pygame
+
+Layer = tuple[pygame.Surface, tuple[int, int]]
+
+
+class DirtyRectRenderer:
+    """Redraws and presents only the parts of the screen that changed
+
+    Args:
+        screen: The display surface
+
+    Attributes:
+        screen: The display surface
+        presented_frames: How many frames were actually pushed to the display
+    """
+
+    def __init__(self, screen: pygame.Surface):
+        self.screen = screen
+        self.presented_frames = 0
+        self._dirty_rects: list[pygame.Rect] = []
+        self._all_dirty = False
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether anything needs to be presented this frame"""
+        return self._all_dirty or bool(self._dirty_rects)
+
+    def mark_dirty(self, rect: pygame.Rect | Sequence[int]):
+        """Mark an area of the screen as changed"""
+        rect = pygame.Rect(rect).clip(self.screen.get_rect())
+        if rect.width and rect.height:
+            self._dirty_rects.append(rect)
+
+    def mark_all_dirty(self):
+        """Mark the whole screen as changed"""
+        self._all_dirty = True
+
+    def redraw(self, layers: Sequence[Layer], area: pygame.Rect | None = None):
+        """Draw the layers, bottom first, into an area and mark it as changed
+
+        Args:
+            layers: (surface, position) pairs to blit
+            area: Area of the screen to redraw, the whole screen if None
+        """
+        self.screen.set_clip(area)
+        self.screen.fill((0, 0, 0))
+        self.screen.blits(layers, doreturn=False)
+        self.screen.set_clip(None)
+        if area is None:
+            self.mark_all_dirty()
+        else:
+            self.mark_dirty(area)
+
+    def present(self) -> bool:
+        """Push the changed areas to the display, does nothing if none changed
+
+        Returns:
+            Whether the display was updated
+        """
+        if not self.has_changes:
+            return False
+        if self._all_dirty:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._dirty_rects)
+        self._dirty_rects = []
+        self._all_dirty = False
+        self.presented_frames += 1
+        return True
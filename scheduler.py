@@ -0,0 +1,83 @@
+import collections
+import time
+
+import pygame
+
+
+class FrameScheduler:
+    """Paces the main loop to a target frame rate and sleeps while idle
+
+    Args:
+        target_fps: Most frames to run per second
+        idle_timeout_ms: Longest time to block for input while idle
+        history_size: How many frames the budget statistics cover
+
+    Attributes:
+        target_fps: Most frames to run per second
+        frame_budget: Seconds of work a frame may take at the target frame rate
+        work_times: Seconds of work of the most recent frames, without waiting
+        over_budget_frames: How many frames took longer than the budget
+        idle_frames: How many frames blocked waiting for input
+
+    Raises:
+        ValueError: target_fps is not above 0
+    """
+
+    def __init__(
+        self, target_fps: int = 60, idle_timeout_ms: int = 1000, history_size: int = 120
+    ):
+        if target_fps <= 0:
+            raise ValueError(f"Target frame rate must be above 0, not {target_fps}")
+        self.target_fps = target_fps
+        self.frame_budget = 1 / target_fps
+        self.idle_timeout_ms = idle_timeout_ms
+        self.work_times: collections.deque[float] = collections.deque(
+            maxlen=history_size
+        )
+        self.over_budget_frames = 0
+        self.idle_frames = 0
+        self._clock = pygame.time.Clock()
+        self._frame_start = time.perf_counter()
+        self._animating = False
+
+    def keep_awake(self):
+        """Prevent the next frame from idling, call this every frame of an animation"""
+        self._animating = True
+
+    def get_events(self, idle: bool) -> list[pygame.event.Event]:
+        """Get this frame's pygame events and start timing the frame
+
+        Args:
+            idle: Whether nothing is pending, in which case this blocks until an
+                event arrives or the idle timeout runs out
+        """
+        events = []
+        if idle and not self._animating:
+            self.idle_frames += 1
+            event = pygame.event.wait(self.idle_timeout_ms)
+            if event.type != pygame.NOEVENT:
+                events.append(event)
+        self._animating = False
+        self._frame_start = time.perf_counter()
+        events.extend(pygame.event.get())
+        return events
+
+    def end_frame(self):
+        """Record the frame's work time and wait out the rest of the frame"""
+        work_time = time.perf_counter() - self._frame_start
+        self.work_times.append(work_time)
+        if work_time > self.frame_budget:
+            self.over_budget_frames += 1
+        self._clock.tick(self.target_fps)
+
+    @property
+    def average_work_time(self) -> float:
+        """Average seconds of work over the recent frames"""
+        if not self.work_times:
+            return 0.0
+        return sum(self.work_times) / len(self.work_times)
+
+    @property
+    def budget_usage(self) -> float:
+        """Average fraction of the frame budget used over the recent frames"""
+        return self.average_work_time / self.frame_budget
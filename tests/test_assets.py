@@ -0,0 +1,24 @@
+from assets import AssetCache, build_pack
+
+NAME = "Player/player_up.png"
+
+
+def test_mapped_arrays_do_not_count(tmp_path):
+    """Arrays mapped from a pack take up none of the memory budget"""
+    pack_path = tmp_path / "assets.pack"
+    build_pack((NAME,), pack_path)
+    cache = AssetCache(pack_path=pack_path)
+    cache.array(NAME)
+    assert cache.loads == 0
+    assert cache.memory_used == 0
+
+
+def test_decoded_arrays_count(tmp_path):
+    """Arrays decoded from an image are charged to the memory budget"""
+    cache = AssetCache(pack_path=None)
+    array = cache.array(NAME)
+    image = cache.image(NAME)
+    assert cache.loads == 1
+    assert cache.memory_used == array.nbytes + image.width * image.height * len(
+        image.getbands()
+    )
@@ -0,0 +1,32 @@
+import pytest
+
+from Puzzles.connector_puzzle import Connector
+from Puzzles.connector_solver import is_solution
+
+
+@pytest.fixture
+def puzzle():
+    """An 8x8 Connector puzzle"""
+    return Connector("sample_images/Monalisa.png", 8, (380, 500))
+
+
+def test_solve_is_a_solution(puzzle):
+    """The solution hints are taken from keeps the clues and connects every color"""
+    assert is_solution(puzzle.clues, puzzle.solve(), puzzle.pieces_per_side)
+
+
+def test_hints_solve_the_puzzle(puzzle):
+    """Following the hints one tile at a time ends in a solved puzzle"""
+    for _ in range(puzzle.total_pieces):
+        tile = puzzle.hint()
+        if tile is None:
+            break
+        assert not puzzle.locked[tile]
+        puzzle.set_color(tile, puzzle.solve()[tile])
+    assert puzzle.is_solved()
+
+
+def test_hint_rejects_a_bad_solution(puzzle, monkeypatch):
+    """A solution that does not connect the colors gives no hint"""
+    monkeypatch.setattr(puzzle, "solve", lambda: [0] * puzzle.total_pieces)
+    assert puzzle.hint() is None
@@ -0,0 +1,55 @@
+import random
+import time
+
+import pytest
+
+from Puzzles.connector_solver import ConnectorSolver, is_solution
+
+# Slowest generate and solve rate of 16x16 boards that is still fast enough
+BOARDS_PER_SECOND = 100
+
+
+def test_generate_rejects_colors_that_do_not_fit():
+    """Three colors need six tiles, more than a 2x2 board has"""
+    with pytest.raises(ValueError):
+        ConnectorSolver(2).generate(3, 0.5, random.Random(0))
+
+
+@pytest.mark.parametrize("colors", [1, 2])
+def test_generate_small_board(colors):
+    """Colors that fit on a 2x2 board make a valid board"""
+    clues, solution = ConnectorSolver(2).generate(colors, 0.5, random.Random(0))
+    assert is_solution(clues, solution, 2)
+
+
+@pytest.mark.parametrize("difficulty", [0.0, 0.5, 1.0])
+def test_generate_3x3(difficulty):
+    """Three colors fill a 3x3 board at every difficulty"""
+    solver = ConnectorSolver(3)
+    for seed in range(10):
+        clues, solution = solver.generate(3, difficulty, random.Random(seed))
+        assert is_solution(clues, solution, 3)
+        assert solver.solve(clues) is not None
+
+
+@pytest.mark.parametrize("size", [8, 12, 16])
+@pytest.mark.parametrize("difficulty", [0.0, 0.5, 1.0])
+def test_generate_and_solve(size, difficulty):
+    """Generated boards and the solver's solutions of them are valid"""
+    solver = ConnectorSolver(size)
+    rng = random.Random(0)
+    for _ in range(20):
+        clues, solution = solver.generate(3, difficulty, rng)
+        assert is_solution(clues, solution, size)
+        assert is_solution(clues, solver.solve(clues), size)
+
+
+def test_generate_and_solve_throughput():
+    """16x16 boards at the highest difficulty are generated and solved quickly"""
+    solver = ConnectorSolver(16)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(BOARDS_PER_SECOND):
+        clues, _ = solver.generate(3, 1.0, rng)
+        solver.solve(clues)
+    assert time.perf_counter() - start < 1
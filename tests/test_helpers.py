@@ -0,0 +1,26 @@
+import pygame
+
+from helpers import MAX_DIRTY_RECTS, EventBus, EventTypes, _merge_rects
+
+
+def slot(index: int) -> pygame.Rect:
+    """The area of a 10x10 slot in a row of them"""
+    return pygame.Rect(index * 10, 0, 10, 10)
+
+
+def test_merged_rects_are_drawn_once():
+    """Folding the changed areas of two updates keeps every area once"""
+    merged = _merge_rects([slot(0), slot(1)], [slot(1), slot(2)])
+    assert merged == [slot(0), slot(1), slot(2)]
+
+
+def test_many_rects_become_one():
+    """Past MAX_DIRTY_RECTS areas the folded update redraws one area around them"""
+    bus = EventBus()
+    bus.set_coalescing(EventTypes.PUZZLE_SPRITE_UPDATE, _merge_rects)
+    for index in range(MAX_DIRTY_RECTS * 4):
+        bus.add(EventTypes.PUZZLE_SPRITE_UPDATE, [slot(index)])
+    (event,) = bus.get()
+    assert len(event.data) <= MAX_DIRTY_RECTS
+    for index in range(MAX_DIRTY_RECTS * 4):
+        assert event.data[0].unionall(event.data).contains(slot(index))
@@ -0,0 +1,44 @@
+import pytest
+
+from Puzzles.lights_out_puzzle import LightsOut
+from Puzzles.lights_out_solver import get_solver, toggle_masks
+
+
+def fewest_presses(size: int) -> dict[int, int]:
+    """The fewest presses that make every reachable board, by trying every set"""
+    masks = toggle_masks(size)
+    boards = [0] * (1 << len(masks))
+    fewest = {0: 0}
+    for presses in range(1, len(boards)):
+        lowest = (presses & -presses).bit_length() - 1
+        boards[presses] = boards[presses & (presses - 1)] ^ masks[lowest]
+        count = bin(presses).count("1")
+        if fewest.get(boards[presses], count) >= count:
+            fewest[boards[presses]] = count
+    return fewest
+
+
+@pytest.mark.parametrize("size", [3, 4])
+def test_solutions_are_correct_and_fewest(size):
+    """Every board is solved with the fewest presses, or found unsolvable"""
+    solver = get_solver(size)
+    masks = toggle_masks(size)
+    fewest = fewest_presses(size)
+    for board in range(1 << (size * size)):
+        solution = solver.solve(board)
+        assert solver.is_solvable(board) == (board in fewest)
+        if board not in fewest:
+            assert solution is None
+            continue
+        assert len(solution) == len(set(solution)) == fewest[board]
+        for tile in solution:
+            board ^= masks[tile]
+        assert board == 0
+
+
+def test_scramble_needs_a_move():
+    """Scrambling into a board that takes no moves is refused"""
+    with pytest.raises(ValueError):
+        LightsOut("sample_images/Monalisa.png", 3, (300, 300), min_moves=0)
+    puzzle = LightsOut("sample_images/Monalisa.png", 3, (300, 300), min_moves=1)
+    assert not puzzle.is_solved()
@@ -0,0 +1,117 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from Player.collision_grid import SOLID, CollisionGrid
+from Player.pathfinding import STEPS, DistanceFields, find_path
+
+GRID_SEEDS = range(10)
+
+
+def random_grid(seed: int) -> CollisionGrid:
+    """A 30x20 grid with a quarter of its tiles solid and a few interactables"""
+    rng = np.random.default_rng(seed)
+    collision_map = np.zeros((20, 30, 3), np.uint8)
+    collision_map[rng.random((20, 30)) < 0.25, 0] = 255
+    for y, x in zip(rng.integers(20, size=4), rng.integers(29, size=4)):
+        collision_map[y, x : x + 2] = (0, 255, 0)
+    return CollisionGrid(collision_map)
+
+
+def distances(grid: CollisionGrid, start: tuple[int, int]) -> dict:
+    """Steps from start to every tile it can walk to, or walk into as the last"""
+    found = {start: 0}
+    queue = deque([start])
+    while queue:
+        tile = queue.popleft()
+        for step_x, step_y in STEPS:
+            neighbor = (tile[0] + step_x, tile[1] + step_y)
+            if neighbor in found or not (
+                0 <= neighbor[0] < grid.shape[0] and 0 <= neighbor[1] < grid.shape[1]
+            ):
+                continue
+            found[neighbor] = found[tile] + 1
+            if grid.is_walkable(neighbor):
+                queue.append(neighbor)
+    return found
+
+
+def assert_walkable(grid: CollisionGrid, start: tuple[int, int], path: list):
+    """Every step of a path goes to a neighbor, walkable until the last one"""
+    previous = start
+    for index, tile in enumerate(path):
+        assert abs(tile[0] - previous[0]) + abs(tile[1] - previous[1]) == 1
+        assert index == len(path) - 1 or grid.is_walkable(tile)
+        previous = tile
+
+
+def walkable_start(grid: CollisionGrid) -> tuple[int, int]:
+    """The walkable tile closest to the middle of the grid"""
+    tiles = [
+        (x, y)
+        for x in range(grid.shape[0])
+        for y in range(grid.shape[1])
+        if grid.is_walkable((x, y))
+    ]
+    return min(tiles, key=lambda tile: abs(tile[0] - 15) + abs(tile[1] - 10))
+
+
+@pytest.mark.parametrize("seed", GRID_SEEDS)
+def test_find_path_is_shortest(seed):
+    """A* finds a shortest path to every tile breadth first search reaches"""
+    grid = random_grid(seed)
+    start = walkable_start(grid)
+    reachable = distances(grid, start)
+    for x in range(grid.shape[0]):
+        for y in range(grid.shape[1]):
+            path = find_path(grid, start, (x, y))
+            if (x, y) not in reachable:
+                assert path is None
+                continue
+            assert len(path) == reachable[(x, y)]
+            assert (x, y) == (path[-1] if path else start)
+            assert_walkable(grid, start, path)
+
+
+@pytest.mark.parametrize("seed", GRID_SEEDS)
+def test_path_to_puzzle_is_shortest(seed):
+    """Following a distance field reaches the closest tile of the interactable"""
+    grid = random_grid(seed)
+    start = walkable_start(grid)
+    reachable = distances(grid, start)
+    fields = DistanceFields(grid)
+    for puzzle_id in range(grid.puzzle_count):
+        path = fields.path_to_puzzle(start, puzzle_id)
+        steps = [
+            reachable[tile]
+            for tile, tile_puzzle in grid.puzzle_ids.items()
+            if tile_puzzle == puzzle_id and tile in reachable
+        ]
+        if not steps:
+            assert path is None
+            continue
+        assert len(path) == min(steps)
+        assert grid.puzzle_at(path[-1]) == puzzle_id
+        assert_walkable(grid, start, path)
+
+
+def test_find_path_gives_up():
+    """A goal further away than max_nodes tiles is not searched for"""
+    grid = CollisionGrid(np.zeros((1, 100, 3), np.uint8))
+    assert len(find_path(grid, (0, 0), (99, 0))) == 99
+    assert find_path(grid, (0, 0), (99, 0), max_nodes=50) is None
+
+
+def test_fields_follow_the_grid():
+    """Fields are built up front and again once the grid changes"""
+    collision_map = np.zeros((1, 10, 3), np.uint8)
+    collision_map[0, 9] = (0, 255, 0)
+    grid = CollisionGrid(collision_map)
+    fields = DistanceFields(grid)
+    field = fields.field(0)
+    assert field[0, 0] == 9
+    grid.set_flags((5, 0), SOLID)
+    fields.refresh()
+    assert fields.field(0) is not field
+    assert fields.path_to_puzzle((0, 0), 0) is None
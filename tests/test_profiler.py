@@ -0,0 +1,48 @@
+import threading
+
+import pygame
+import pytest
+
+from helpers import SurfaceCounter, surface_counter
+from profiler import FrameProfiler
+
+
+@pytest.fixture
+def screen():
+    """A surface to draw the overlay on, with pygame's fonts set up"""
+    pygame.font.init()
+    yield pygame.Surface((400, 300))
+    pygame.font.quit()
+
+
+def test_surface_counter_is_thread_safe():
+    """Surfaces added from several threads at once are all counted"""
+    counter = SurfaceCounter()
+    surface = pygame.Surface((4, 4))
+
+    def add():
+        """Add the surface a lot of times"""
+        for _ in range(10000):
+            counter.add(surface)
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.surfaces == 40000
+    assert counter.bytes == 40000 * surface.get_pitch() * surface.get_height()
+
+
+def test_overlay_renders_only_changes(screen):
+    """Drawing the overlay again without new frames creates no surfaces"""
+    profiler = FrameProfiler(enabled=True)
+    for _ in range(3):
+        profiler.begin_frame()
+        with profiler.phase("update"):
+            pass
+        profiler.end_frame()
+    first = profiler.draw_overlay(screen, (400, 0))
+    surfaces = surface_counter.surfaces
+    assert profiler.draw_overlay(screen, (400, 0)) == first
+    assert surface_counter.surfaces == surfaces
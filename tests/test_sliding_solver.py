@@ -0,0 +1,120 @@
+import itertools
+import random
+from collections import deque
+
+import pytest
+
+from Puzzles.sliding_solver import SlidingSolver, count_inversions, is_solvable
+
+
+def walk(solver: SlidingSolver, steps: int, rng: random.Random) -> list[int]:
+    """Scramble a solved board by sliding random tiles into the blank"""
+    board = list(range(solver.cells))
+    blank = previous = solver.blank
+    for _ in range(steps):
+        slot = rng.choice([s for s in solver.neighbors(blank) if s != previous])
+        board[blank], board[slot] = board[slot], board[blank]
+        previous, blank = blank, slot
+    return board
+
+
+def shortest_lengths(solver: SlidingSolver, depth: int) -> dict[tuple, int]:
+    """Breadth first search the boards up to depth moves from solved"""
+    solved = tuple(range(solver.cells))
+    lengths = {solved: 0}
+    queue = deque([solved])
+    while queue:
+        board = queue.popleft()
+        if lengths[board] == depth:
+            continue
+        blank = board.index(solver.blank)
+        for slot in solver.neighbors(blank):
+            moved = list(board)
+            moved[blank], moved[slot] = moved[slot], moved[blank]
+            moved = tuple(moved)
+            if moved not in lengths:
+                lengths[moved] = lengths[board] + 1
+                queue.append(moved)
+    return lengths
+
+
+def replay(solver: SlidingSolver, board: list[int], solution: list[int]) -> list[int]:
+    """Slide the tiles of a solution into the blank one after the other"""
+    board = list(board)
+    blank = board.index(solver.blank)
+    for slot in solution:
+        assert slot in solver.neighbors(blank)
+        board[blank], board[slot] = board[slot], board[blank]
+        blank = slot
+    return board
+
+
+def test_count_inversions():
+    """Counts the same pairs as comparing every pair"""
+    rng = random.Random(0)
+    for length in range(12):
+        values = rng.sample(range(50), length)
+        pairs = sum(a > b for a, b in itertools.combinations(values, 2))
+        assert count_inversions(values) == pairs
+
+
+@pytest.mark.parametrize("size", [2, 3, 4, 5])
+def test_is_solvable_parity(size):
+    """Scrambled boards are solvable until two tiles are swapped"""
+    solver = SlidingSolver(size, use_pattern_databases=False)
+    rng = random.Random(size)
+    for _ in range(20):
+        board = walk(solver, 50, rng)
+        assert is_solvable(board, size)
+        first, second = (board.index(tile) for tile in (0, 1))
+        board[first], board[second] = board[second], board[first]
+        assert not is_solvable(board, size)
+
+
+@pytest.mark.parametrize("use_pattern_databases", [False, True])
+def test_optimal_length_2x2(use_pattern_databases):
+    """Every solvable 2x2 board gets its shortest solution"""
+    solver = SlidingSolver(2, use_pattern_databases)
+    for board, length in shortest_lengths(solver, 6).items():
+        assert solver.optimal_length(board) == length
+
+
+@pytest.mark.parametrize("use_pattern_databases", [False, True])
+def test_optimal_length_3x3(use_pattern_databases):
+    """Boards up to 14 moves from solved get their shortest solution"""
+    solver = SlidingSolver(3, use_pattern_databases)
+    lengths = shortest_lengths(solver, 14)
+    for board in random.Random(0).sample(sorted(lengths), 200):
+        solution = solver.solve(board)
+        assert len(solution) == lengths[board]
+        assert replay(solver, board, solution) == list(range(solver.cells))
+
+
+def test_solve_rejects_unsolvable_board():
+    """Boards with two tiles swapped cannot be solved"""
+    with pytest.raises(ValueError):
+        SlidingSolver(3).solve([1, 0, 2, 3, 4, 5, 6, 7, 8])
+
+
+def test_hint_is_the_first_move():
+    """The hint is the first tile of a shortest solution, none on a solved board"""
+    solver = SlidingSolver(3)
+    board = walk(solver, 20, random.Random(0))
+    assert solver.hint(board) == solver.solve(board)[0]
+    assert solver.hint(list(range(solver.cells))) is None
+
+
+def test_timeout():
+    """Running out of nodes gives no solution and no hint"""
+    solver = SlidingSolver(4)
+    board = walk(solver, 200, random.Random(0))
+    assert solver.solve(board, max_nodes=10) is None
+    assert solver.hint(board, max_nodes=10) is None
+
+
+@pytest.mark.parametrize("weight", [1, 5])
+def test_large_board_runs_out_of_nodes(weight):
+    """Long searches on big boards end at max_nodes instead of the recursion limit"""
+    solver = SlidingSolver(30)
+    board = walk(solver, 20000, random.Random(0))
+    assert solver.solve(board, 2000, weight) is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pygame
+import pytest
+
+from assets import asset_cache
+from GameMap.game_map import GameMap
+from GameMap.tile_map import ChunkedGameMap, TileMap, make_game_map
+
+FLOOR = "GameMap/floor_surface.png"
+DECO = "GameMap/deco_surface.png"
+TILE_PIXEL_SIZE = np.array((16, 12))
+TILES_ON_SCREEN = np.array((20, 15))
+STARTING_POSITION = np.array((2, 10))
+SHIFTS = [(0, 0), (-5, 0), (-4, -12), (3, 0), (20, 25), (10, 5), (-30, 0)]
+
+
+def make_map(memory_budget: int) -> GameMap | ChunkedGameMap:
+    """The shipped map at twice its size"""
+    return make_game_map(
+        FLOOR,
+        DECO,
+        TILE_PIXEL_SIZE,
+        TILES_ON_SCREEN,
+        2,
+        STARTING_POSITION,
+        memory_budget,
+    )
+
+
+def draw(game_map: GameMap | ChunkedGameMap) -> np.ndarray:
+    """The pixels the map puts on screen"""
+    screen = pygame.Surface(tuple(TILES_ON_SCREEN * TILE_PIXEL_SIZE * 2))
+    screen.blits(game_map.floor_layers)
+    screen.blits(game_map.deco_layers)
+    return pygame.surfarray.array3d(screen)
+
+
+def test_small_maps_are_drawn_whole():
+    """A map that fits in the budget is a GameMap, one that does not is chunked"""
+    assert isinstance(make_map(2**30), GameMap)
+    assert isinstance(make_map(2**20), ChunkedGameMap)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_chunks_match_the_whole_map(stream):
+    """Chunks drawn on the spot or streamed show the same pixels as GameMap"""
+    whole = make_map(2**30)
+    tile_map = TileMap.from_images(
+        {"floor": asset_cache.array(FLOOR), "deco": asset_cache.array(DECO)},
+        TILE_PIXEL_SIZE,
+    )
+    chunked = ChunkedGameMap(
+        tile_map, TILES_ON_SCREEN, 2, STARTING_POSITION, stream=stream
+    )
+    for shift in SHIFTS:
+        whole.update(shift)
+        chunked.update(shift)
+        assert np.array_equal(draw(whole), draw(chunked))
+    chunked.close()